@@ -0,0 +1,138 @@
+"""Бенчмарк parse_word_list на великому корпусі
+
+Спочатку перевіряє, що результат збігається з попередньою реалізацією
+(legacy_parse_word_list) на крайових випадках і на кожному корпусі, потім
+вимірює пропускну здатність обох.
+
+Запуск: python benchmarks/bench_parse.py [кількість рядків]
+"""
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from main import parse_word_list  # noqa: E402
+
+
+def legacy_parse_word_list(text):
+    """Попередня реалізація parse_word_list (еталон для порівняння)"""
+    lines = text.strip().split('\n')
+    words = []
+
+    # Можливі роздільники
+    separators = [' - ', ' – ', ' — ', ' | ', ' : ', ' ; ', '\t']
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Пробуємо різні роздільники
+        for sep in separators:
+            if sep in line:
+                parts = line.split(sep, 1)
+                if len(parts) == 2:
+                    eng = parts[0].strip()
+                    ukr = parts[1].strip()
+                    if eng and ukr:
+                        words.append((eng, ukr))
+                    break
+        else:
+            # Якщо не знайдено роздільник, спробуємо пробіл
+            parts = line.split()
+            if len(parts) >= 2:
+                # Перша частина - англійське слово, решта - переклад
+                eng = parts[0]
+                ukr = ' '.join(parts[1:])
+                words.append((eng, ukr))
+
+    return words
+
+
+EDGE_CASES = [
+    '',
+    '   \n\n  ',
+    'apple - яблуко',
+    '  apple   -   яблуко  ',
+    'apple',
+    'apple -',
+    '- apple',
+    ' - apple',
+    'apple - ',
+    'a | b - c',
+    'a - b | c',
+    'a | - b',
+    'a : b ; c\td',
+    'a\tb',
+    '\ta b',
+    'a b\t',
+    'a\t\tb',
+    'one  two   three',
+    'one\x0btwo\x0cthree',
+    'a – b — c',
+    'a—b',
+    'a -- b',
+    'word\r\nслово переклад\r\n',
+    'x - y\n\nz | w\nq r s\n-\n|',
+    'sun ; сонце\nmoon : місяць\nstar — зірка\nsky – небо',
+]
+
+# Набори роздільників для корпусів: зазвичай файл використовує один роздільник
+CORPORA = {
+    'dash': [' - '],
+    'tab': ['\t'],
+    'space': [' '],
+    'mixed': [' - '] * 6 + [' – ', ' — ', ' | ', ' : ', ' ; ', '\t', ' '],
+}
+
+
+def make_corpus(lines, separators, seed=42):
+    """Випадковий корпус рядків з заданими роздільниками і пробілами"""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(lines):
+        sep = rnd.choice(separators)
+        padding = ' ' * rnd.randint(0, 2)
+        out.append(f"{padding}word{i}{sep}переклад  номер {i}{padding}")
+        if rnd.random() < 0.01:
+            out.append('')
+    return '\n'.join(out)
+
+
+def check_equivalence(corpus):
+    """Новий парсер має давати той самий результат, що й еталон"""
+    assert parse_word_list(corpus) == legacy_parse_word_list(corpus), "результати на корпусі відрізняються"
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    for case in EDGE_CASES:
+        expected = legacy_parse_word_list(case)
+        actual = parse_word_list(case)
+        assert actual == expected, f"{case!r}: {actual!r} != {expected!r}"
+    print(f"✅ Крайові випадки збігаються ({len(EDGE_CASES)})")
+
+    for corpus_name, separators in CORPORA.items():
+        corpus = make_corpus(lines, separators)
+        check_equivalence(corpus)
+
+        results = {}
+        for name, func in (('legacy', legacy_parse_word_list), ('current', parse_word_list)):
+            results[name] = min(timeit.repeat(lambda: func(corpus), number=1, repeat=3))
+
+        print(
+            f"{corpus_name:>6}: {lines} рядків, "
+            f"legacy {lines / results['legacy']:,.0f} рядків/с, "
+            f"current {lines / results['current']:,.0f} рядків/с "
+            f"(x{results['legacy'] / results['current']:.2f})"
+        )
+
+
+if __name__ == '__main__':
+    main()
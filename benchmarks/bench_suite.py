@@ -0,0 +1,207 @@
+"""Набір мікробенчмарків для DatabaseManager і допоміжних функцій бота
+
+Вимірює читання і запис словника в БД для різних розмірів словника,
+розбір великого списку слів, екранування довгих рядків і рендеринг сторінок
+списку слів. Результати зберігаються в JSON; з --compare виводиться
+порівняння з попереднім запуском, а сповільнення понад --threshold
+вважається регресією (код виходу 1).
+
+Запуск: python benchmarks/bench_suite.py [--sizes 10,100,1000,10000,100000]
+        [--output results.json] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timezone
+from itertools import count
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+from db_manager import DatabaseManager  # noqa: E402
+from scheduler import Card  # noqa: E402
+from main import escape_markdown_v2, parse_word_list, render_deletion_page, render_words_page  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+REPEAT = 5
+
+
+def make_words(size, prefix='word'):
+    return [(f"{prefix}{i}", f"переклад слова номер {i}") for i in range(size)]
+
+
+def best_of(func, number=1, repeat=REPEAT):
+    """Найкращий час одного виклику з repeat серій по number викликів"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench_db(sizes, workdir):
+    db = DatabaseManager(os.path.join(workdir, 'suite.db'))
+    user_ids = count(1)
+    results = []
+
+    for size in sizes:
+        words = make_words(size)
+
+        # Запис: кожне повторення - новий користувач і нові пари слів, щоб не впертися
+        # в унікальний індекс і щоб кожен раз пари додавались і до спільного словника
+        def add_words(repeat):
+            user_id = next(user_ids)
+            db.create_user(user_id)
+            new_words = make_words(size, f"add{size}r{repeat}w")
+            start = time.perf_counter()
+            db.add_words(user_id, new_words)
+            return time.perf_counter() - start
+        add_time = min(add_words(repeat) for repeat in range(REPEAT))
+        results.append(result('db.add_words', {'words': size}, add_time, size))
+
+        user_id = next(user_ids)
+        db.create_user(user_id)
+        word_ids = [word_id for word_id, _ in db.add_words(user_id, words)['added']]
+        results.append(result(
+            'db.get_user_data', {'words': size}, best_of(lambda: db.get_user_data(user_id)), size
+        ))
+
+        middle_id = word_ids[len(word_ids) // 2]
+        results.append(result(
+            'db.get_words_page', {'words': size},
+            best_of(lambda: db.get_words_page(user_id, middle_id, 20), number=100)
+        ))
+
+        card = Card(due_at=int(time.time()))
+        results.append(result(
+            'db.save_review', {'words': size},
+            best_of(lambda: db.save_review(user_id, word_ids[-1], card), number=100)
+        ))
+
+    cursors = [(user_id, 1, None, 0, 1) for user_id in range(1, 101)]
+    results.append(result('db.save_cursors', {'users': len(cursors)}, best_of(lambda: db.save_cursors(cursors), number=10)))
+
+    db.close()
+    return results
+
+
+def bench_parse(lines):
+    text = '\n'.join(f"word{i} - переклад номер {i}" for i in range(lines))
+    return [result('parse_word_list', {'lines': lines}, best_of(lambda: parse_word_list(text)), lines)]
+
+
+def bench_escape(length):
+    text = ("Hello_world! (test) [link] *bold* #tag " * (length // 40 + 1))[:length]
+    return [result('escape_markdown_v2', {'chars': length}, best_of(lambda: escape_markdown_v2(text), number=10))]
+
+
+def bench_render(sizes):
+    results = []
+    for size in sizes:
+        words = [(word_id, list(word)) for word_id, word in enumerate(make_words(size), 1)]
+        for name, render, page_size in (
+            ('render_words_page', render_words_page, 20),
+            ('render_deletion_page', render_deletion_page, 10),
+        ):
+            start = (size // 2) // page_size * page_size
+            page = {
+                'words': words[start:start + page_size],
+                'start': None,
+                'total': size,
+                'prev_id': words[start - page_size][0] if start else None,
+                'next_id': words[start + page_size][0] if start + page_size < size else None,
+            }
+            results.append(result(name, {'words': size}, best_of(lambda: render(page, start), number=100)))
+    return results
+
+
+def result(name, params, seconds, items=None):
+    entry = {'name': name, 'params': params, 'seconds': seconds}
+    if items:
+        entry['items_per_second'] = items / seconds
+    return entry
+
+
+def result_key(entry):
+    return entry['name'] + ''.join(f" {key}={value}" for key, value in sorted(entry['params'].items()))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous, threshold):
+    """Порівняння з попереднім запуском; повертає кількість регресій"""
+    before = {result_key(entry): entry['seconds'] for entry in previous['results']}
+    regressions = 0
+    print(f"\nПорівняння з {previous.get('commit') or '?'} ({previous.get('timestamp', '?')}):")
+    for entry in results:
+        key = result_key(entry)
+        if key not in before:
+            continue
+        ratio = entry['seconds'] / before[key]
+        mark = ''
+        if ratio > threshold:
+            mark = '  ⚠️ регресія'
+            regressions += 1
+        print(f"{key:>45}: x{ratio:.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="розміри словника через кому")
+    parser.add_argument('--parse-lines', type=int, default=100_000, help="рядків у списку для parse_word_list")
+    parser.add_argument('--escape-chars', type=int, default=100_000, help="довжина рядка для escape_markdown_v2")
+    parser.add_argument('--output', help="файл для результатів (за замовчуванням benchmarks/results/<час>.json)")
+    parser.add_argument('--compare', help="JSON попереднього запуску для порівняння")
+    parser.add_argument('--threshold', type=float, default=1.2, help="сповільнення, яке вважається регресією")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    workdir = tempfile.mkdtemp()
+
+    results = []
+    results += bench_db(sizes, workdir)
+    results += bench_parse(args.parse_lines)
+    results += bench_escape(args.escape_chars)
+    results += bench_render(sizes)
+
+    for entry in results:
+        throughput = f", {entry['items_per_second']:,.0f} од./с" if 'items_per_second' in entry else ''
+        print(f"{result_key(entry):>45}: {entry['seconds'] * 1000:10.3f} мс{throughput}")
+
+    now = datetime.now(timezone.utc)
+    report = {
+        'timestamp': now.isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', now.strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультати збережено в {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        if compare(results, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
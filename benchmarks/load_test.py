@@ -0,0 +1,307 @@
+"""Навантажувальний тест бота з підставним сервером Bot API
+
+Запускає справжній бот (main.py, режим polling) окремим процесом, спрямувавши
+його на локальний підставний Bot API (TELEGRAM_API_URL). Віртуальні
+користувачі надсилають /start, імпортують слова, вчать їх (next_word,
+show_translation, оцінки) і гортають список, кожен раз чекаючи на відповідь
+бота. Наприкінці виводиться кількість оновлень за секунду і затримка
+p50/p95/p99 від надходження оновлення до відповіді бота.
+
+Бот обмежує частоту повідомлень в один чат (OUTBOUND_CHAT_RATE), тож
+віртуальний користувач без пауз упирається в цей ліміт; для вимірювання
+пропускної здатності самого бота запускайте з OUTBOUND_CHAT_RATE=0.
+
+Запуск: python benchmarks/load_test.py [--users 50] [--duration 30] [--words 200]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from itertools import count
+from urllib.parse import parse_qs
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from http_server import HttpServer  # noqa: E402
+
+TOKEN = '123456:load-test'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'EngWordBot', 'username': 'eng_word_bot'}
+# Скільки секунд чекати на відповідь бота, перш ніж вважати дію невдалою
+RESPONSE_TIMEOUT = 30
+
+# Відносна частота дій користувача, коли відповідна кнопка є на екрані
+ACTION_WEIGHTS = {
+    'next_word': 40,
+    'show_translation': 25,
+    'knew_word': 10,
+    'forgot_word': 5,
+    'show_all': 4,
+    'words_page': 6,
+    'stats': 3,
+    'manage_words': 3,
+    'back_to_main': 4,
+}
+# Ймовірність дій, що не залежать від кнопок на екрані
+START_PROBABILITY = 0.01
+IMPORT_PROBABILITY = 0.01
+
+
+class FakeBotApi:
+    """Підставний Bot API: віддає оновлення через getUpdates і запам'ятовує відповіді бота"""
+
+    def __init__(self):
+        self.server = HttpServer('127.0.0.1', 0)
+        self._updates = []
+        self._update_ids = count(1)
+        self._message_ids = count(1)
+        self._new_updates = asyncio.Event()
+        self._waiters = {}  # chat_id -> Future з наступною відповіддю бота
+        self._stopping = False
+        self.ready = asyncio.Event()
+        self.calls = defaultdict(int)
+
+        for method, handler in (
+            ('getMe', self.get_me),
+            ('deleteWebhook', self.ok),
+            ('getUpdates', self.get_updates),
+            ('answerCallbackQuery', self.ok),
+            ('sendMessage', self.send_message),
+            ('editMessageText', self.edit_message_text),
+        ):
+            self.server.route('POST', f'/bot{TOKEN}/{method}')(self._counted(method, handler))
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.port}/bot'
+
+    def _counted(self, method, handler):
+        async def wrapper(request):
+            self.calls[method] += 1
+            params = {key: values[0] for key, values in parse_qs(request.body.decode()).items()}
+            result = await handler(params)
+            return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+        return wrapper
+
+    async def start(self):
+        await self.server.start()
+
+    async def stop(self):
+        self._stopping = True
+        self._new_updates.set()
+        await self.server.stop()
+
+    # Методи Bot API
+
+    async def ok(self, params):
+        return True
+
+    async def get_me(self, params):
+        return BOT_USER
+
+    async def get_updates(self, params):
+        self.ready.set()
+        offset = int(params.get('offset', 0))
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+
+        if not self._updates and not self._stopping:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get('timeout', 0)))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:100]
+
+    def _message(self, chat_id, message_id, params):
+        markup = json.loads(params['reply_markup']) if 'reply_markup' in params else {}
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', ''),
+        }
+        if markup:
+            message['reply_markup'] = markup
+
+        waiter = self._waiters.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(message)
+        return message
+
+    async def send_message(self, params):
+        return self._message(int(params['chat_id']), next(self._message_ids), params)
+
+    async def edit_message_text(self, params):
+        return self._message(int(params['chat_id']), int(params['message_id']), params)
+
+    # Оновлення від віртуальних користувачів
+
+    async def _push(self, chat_id, payload):
+        """Надіслати оновлення і дочекатися відповіді бота в цьому чаті"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = waiter
+        self._updates.append({'update_id': next(self._update_ids), **payload})
+        self._new_updates.set()
+        return await asyncio.wait_for(waiter, RESPONSE_TIMEOUT)
+
+    async def send_text(self, user_id, text):
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user_dict(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return await self._push(user_id, {'message': message})
+
+    async def tap(self, user_id, message, data):
+        return await self._push(user_id, {'callback_query': {
+            'id': str(next(self._message_ids)),
+            'from': user_dict(user_id),
+            'chat_instance': str(user_id),
+            'message': message,
+            'data': data,
+        }})
+
+
+def user_dict(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+
+
+def buttons(message):
+    """callback_data усіх кнопок повідомлення"""
+    keyboard = message.get('reply_markup', {}).get('inline_keyboard', [])
+    return [button['callback_data'] for row in keyboard for button in row if 'callback_data' in button]
+
+
+def word_list(rnd, words):
+    return '\n'.join(f"word{rnd.randrange(10 ** 6)} - слово {i}" for i in range(words))
+
+
+def choose_action(rnd, message):
+    """Кнопка, яку натисне користувач, з урахуванням частоти дій"""
+    candidates = [data for data in buttons(message) if data.split(':', 1)[0] in ACTION_WEIGHTS]
+    if not candidates:
+        return 'back_to_main'
+    weights = [ACTION_WEIGHTS[data.split(':', 1)[0]] for data in candidates]
+    return rnd.choices(candidates, weights)[0]
+
+
+async def virtual_user(api, user_id, args, deadline, latencies, errors):
+    rnd = random.Random(user_id)
+
+    async def timed(action, coroutine):
+        started = time.perf_counter()
+        try:
+            result = await coroutine
+        except asyncio.TimeoutError:
+            errors[action] += 1
+            return None
+        latencies[action].append(time.perf_counter() - started)
+        return result
+
+    async def import_words():
+        message = await timed('add_words', api.tap(user_id, current, 'add_words'))
+        await timed('import', api.send_text(user_id, word_list(rnd, args.words)))
+        return message
+
+    current = await timed('start', api.send_text(user_id, '/start'))
+    if current is None:
+        return
+    await import_words()
+    current = await timed('back_to_main', api.tap(user_id, current, 'back_to_main')) or current
+
+    while time.monotonic() < deadline:
+        roll = rnd.random()
+        if roll < START_PROBABILITY:
+            current = await timed('start', api.send_text(user_id, '/start')) or current
+        elif roll < START_PROBABILITY + IMPORT_PROBABILITY:
+            current = await import_words() or current
+        else:
+            data = choose_action(rnd, current)
+            current = await timed(data.split(':', 1)[0], api.tap(user_id, current, data)) or current
+
+        if args.think_time:
+            await asyncio.sleep(rnd.expovariate(1 / args.think_time))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def report(latencies, errors, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    print(f"Оновлень: {total} за {elapsed:.1f} с - {total / elapsed:,.1f} оновлень/с, помилок: {sum(errors.values())}")
+    print(f"{'дія':>18} {'к-сть':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+
+    rows = sorted(latencies.items(), key=lambda item: -len(item[1]))
+    rows.append(('усі', [value for values in latencies.values() for value in values]))
+    for action, values in rows:
+        values = sorted(values)
+        print(
+            f"{action:>18} {len(values):>8} "
+            + ' '.join(f"{percentile(values, p) * 1000:>9.1f}" for p in (50, 95, 99))
+        )
+
+
+async def run(args):
+    api = FakeBotApi()
+    await api.start()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN=TOKEN,
+        TELEGRAM_API_URL=api.url,
+        BOT_MODE='polling',
+        DB_PATH=os.path.join(workdir, 'load_test.db'),
+    )
+    if args.concurrency is not None:
+        env['MAX_CONCURRENT_UPDATES'] = str(args.concurrency)
+
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(ROOT, 'main.py'), cwd=workdir, env=env
+    )
+    try:
+        await asyncio.wait_for(api.ready.wait(), 30)
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(api, 10 ** 6 + i, args, deadline, latencies, errors)
+            for i in range(args.users)
+        ))
+        report(latencies, errors, time.monotonic() - started)
+        print(f"Запити до Bot API: {dict(api.calls)}")
+    finally:
+        bot.send_signal(signal.SIGINT)
+        await bot.wait()
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help="кількість віртуальних користувачів")
+    parser.add_argument('--duration', type=float, default=30, help="тривалість тесту, секунди")
+    parser.add_argument('--words', type=int, default=200, help="слів в одному імпорті")
+    parser.add_argument('--think-time', type=float, default=0, help="середня пауза між діями, секунди")
+    parser.add_argument('--concurrency', type=int, help="MAX_CONCURRENT_UPDATES для бота")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
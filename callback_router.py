@@ -0,0 +1,50 @@
+class CallbackRouter:
+    """Таблиця обробників кнопок за callback_data
+
+    callback_data має вигляд "назва" або "назва:аргумент". Обробник
+    шукається за назвою в словнику (O(1)), а аргумент перетворюється
+    типом, вказаним при реєстрації.
+    """
+
+    SEPARATOR = ':'
+
+    def __init__(self):
+        self._routes = {}
+
+    def __contains__(self, name):
+        return name in self._routes
+
+    def route(self, name, arg_type=None, load_user=True):
+        """Декоратор: зареєструвати обробник для назви (з аргументом типу arg_type)
+
+        load_user=False - обробнику не потрібні дані користувача в пам'яті.
+        """
+        def decorator(handler):
+            if name in self._routes:
+                raise ValueError(f"Обробник для '{name}' вже зареєстровано")
+            self._routes[name] = (handler, arg_type, load_user)
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """(обробник, аргументи, load_user) для callback_data або None, якщо кнопка невідома"""
+        name, sep, raw_arg = data.partition(self.SEPARATOR)
+        route = self._routes.get(name)
+        if route is None:
+            return None
+
+        handler, arg_type, load_user = route
+        if arg_type is None:
+            return (handler, (), load_user) if not sep else None
+
+        try:
+            return handler, (arg_type(raw_arg),), load_user
+        except ValueError:
+            return None
+
+
+def callback_data(name, arg=None):
+    """Побудова callback_data для CallbackRouter"""
+    if arg is None:
+        return name
+    return f"{name}{CallbackRouter.SEPARATOR}{arg}"
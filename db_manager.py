@@ -1,18 +1,196 @@
+import asyncio
 import sqlite3
 import json
 import logging
+import os
+import time
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from queue import Queue
 from threading import Lock
 
+from metrics import DB_LOCK_WAIT, timed_query
+from scheduler import DAY, Deck, Shuffle
+
+# Версія схеми БД (зберігається в PRAGMA user_version)
+SCHEMA_VERSION = 9
+
+# Налаштування кожного з'єднання
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',  # Читачі не блокуються записом
+    'PRAGMA synchronous = NORMAL',  # У режимі WAL безпечно і без fsync на кожну транзакцію
+    'PRAGMA mmap_size = 268435456',  # 256 МБ
+    'PRAGMA cache_size = -16000',  # ~16 МБ
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Розмір кешу підготовлених запитів на з'єднання
+CACHED_STATEMENTS = 256
+
+# Повнотекстовий індекс words_fts: rowid = (user_id << FTS_WORD_ID_BITS) | word_id.
+# У схемах 6-8 індексувався спільний словник (vocab_fts), зі схеми 9 - знову слова
+# користувачів, але без копії тексту (content = '')
+FTS_WORD_ID_BITS = 23
+# Ідентифікатори слів не використовуються повторно, тож слова з word_id від цієї межі
+# (після багатьох імпортів і видалень) в індекс не потрапляють і шукаються перебором
+FTS_WORD_ID_LIMIT = 1 << FTS_WORD_ID_BITS
+# Найкоротший запит для триграмного індексу; коротші шукаються перебором слів користувача
+FTS_MIN_QUERY = 3
+# Найбільше параметрів в одному запиті з IN (...)
+MAX_QUERY_PARAMS = 900
+# user_id рядків daily_stats з сумами по всіх користувачах шарду
+ALL_USERS = 0
+# Перерахунок лічильників counters з таблиць (при міграції і розбитті на шарди)
+RECOUNT_SQL = (
+    "INSERT OR REPLACE INTO counters (name, value) VALUES "
+    "('users', (SELECT COUNT(*) FROM users)), ('words', (SELECT COUNT(*) FROM words))"
+)
+
+# Онлайн-копія БД: сторінок за крок і пауза (секунди) між кроками, коли замок запису вільний
+BACKUP_STEP_PAGES = 100
+BACKUP_STEP_PAUSE = 0.002
+
+
+def normalize_key(eng):
+    """Ключ слова для пошуку дублікатів: без регістру і зайвих пробілів"""
+    return ' '.join(eng.casefold().split())
+
+
+def shard_index(user_id, shards):
+    """Номер шарду користувача; той самий між запусками і процесами"""
+    return zlib.crc32(user_id.to_bytes(8, 'little', signed=True)) % shards
+
+
+def shard_paths(db_name, shards):
+    """Файли шардів поруч з db_name: words_bot.db -> words_bot.0.db, words_bot.1.db, ..."""
+    root, ext = os.path.splitext(db_name)
+    return [f"{root}.{index}{ext}" for index in range(shards)]
+
+
+def today():
+    """Номер поточного дня (UTC) для daily_stats"""
+    return int(time.time() // DAY)
+
+
+def _add_counter(conn, name, delta):
+    if delta:
+        conn.execute('UPDATE counters SET value = value + ? WHERE name = ?', (delta, name))
+
+
+def _add_daily(conn, rows):
+    """Додати до денної статистики: rows = [(user_id, words_added, reviews, reveals), ...]
+
+    Суми додаються і до рядка ALL_USERS, тож загальна статистика за день - один рядок.
+    """
+    rows = [row for row in rows if any(row[1:])]
+    if not rows:
+        return
+    rows.append((ALL_USERS, *(sum(column) for column in zip(*(row[1:] for row in rows)))))
+    day = today()
+    conn.executemany(
+        'INSERT INTO daily_stats (user_id, day, words_added, reviews, reveals) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT (user_id, day) DO UPDATE SET words_added = words_added + excluded.words_added, '
+        'reviews = reviews + excluded.reviews, reveals = reveals + excluded.reveals',
+        ((user_id, day, words_added, reviews, reveals) for user_id, words_added, reviews, reveals in rows)
+    )
+
+
+def _casefold(value):
+    """SQL-функція casefold: регістронезалежне порівняння для будь-якої мови"""
+    return value.casefold() if isinstance(value, str) else value
+
+
+@contextmanager
+def _migration(conn):
+    """Транзакція міграції схеми
+
+    sqlite3 сам відкриває транзакцію лише перед DML, тож CREATE/ALTER без
+    явного BEGIN фіксувались би одразу, і невдала міграція лишала б схему
+    наполовину оновленою. З BEGIN при помилці відкочується вся міграція.
+    """
+    conn.execute('BEGIN')
+    with conn:
+        yield conn
+
+
+def _is_legacy_pair(word):
+    """Чи є елемент старого JSON-списку слів парою рядків [eng, ukr]"""
+    if isinstance(word, (list, tuple)) and len(word) == 2 and all(isinstance(part, str) for part in word):
+        return True
+    logging.error(f"Пошкоджена пара слів {word!r}, пропускаємо")
+    return False
+
+
+def _intern_term(conn, key):
+    """Ідентифікатор нормалізованого слова в terms (додається, якщо його немає)"""
+    row = conn.execute('SELECT term_id FROM terms WHERE key = ?', (key,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute('INSERT INTO terms (key) VALUES (?)', (key,)).lastrowid
+
+
+def _intern_pair(conn, term_id, eng, ukr):
+    """Ідентифікатор пари (eng, ukr) у спільному словнику vocab (додається, якщо її немає)"""
+    row = conn.execute('SELECT vocab_id FROM vocab WHERE eng = ? AND ukr = ?', (eng, ukr)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute(
+        'INSERT INTO vocab (term_id, eng, ukr) VALUES (?, ?, ?)', (term_id, eng, ukr)
+    ).lastrowid
+
 
 class DatabaseManager:
-    def __init__(self, db_name='words_bot.db'):
+    def __init__(self, db_name='words_bot.db', readers=4):
         self.db_name = db_name
-        self.lock = Lock()  # Для thread-safety
+        self.readers = readers
+        self.lock = Lock()  # Для thread-safety: одночасно пише лише один потік
+
+        # Одне довготривале з'єднання для запису і невеликий пул для читання
+        self._conn = self._connect()
         self.init_db()
+        self._readers = Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+
+    def _connect(self):
+        """Відкриття з'єднання з налаштованими PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=30,
+            check_same_thread=False,  # З'єднання використовуються з потоків пулу
+            cached_statements=CACHED_STATEMENTS
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        # LIKE у SQLite ігнорує регістр лише для ASCII, тож для кирилиці порівнюємо casefold
+        conn.create_function('casefold', 1, _casefold, deterministic=True)
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Транзакція на з'єднанні запису"""
+        started = time.perf_counter()
+        with self.lock:
+            DB_LOCK_WAIT.observe(time.perf_counter() - started)
+            with self._conn:
+                yield self._conn
+
+    @contextmanager
+    def _read(self):
+        """Позичити з'єднання для читання з пулу"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
 
     def init_db(self):
         """Ініціалізація бази даних"""
-        with sqlite3.connect(self.db_name) as conn:
+        with self.lock:
+            conn = self._conn
             cursor = conn.cursor()
 
             # Створюємо таблицю з правильною структурою
@@ -49,56 +227,963 @@ class DatabaseManager:
 
             conn.commit()
 
+            self.migrate(conn)
+
+    def migrate(self, conn):
+        """Послідовне оновлення схеми БД до SCHEMA_VERSION"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+        if version < 1:
+            self._migrate_to_normalized_words(conn)
+        if version < 2:
+            self._migrate_add_schedule(conn)
+        if version < 3:
+            self._migrate_add_word_keys(conn)
+        if version < 4:
+            self._migrate_add_search_index(conn)
+        if version < 5:
+            self._migrate_add_word_count(conn)
+        if version < 6:
+            self._migrate_to_shared_vocab(conn)
+        if version < 7:
+            self._migrate_add_stats(conn)
+        if version < 8:
+            self._migrate_add_shuffle(conn)
+        if version < 9:
+            self._migrate_to_user_search_index(conn)
+
+    def _migrate_to_normalized_words(self, conn):
+        """Перенесення слів з JSON-колонки users.words в окрему таблицю words"""
+        with _migration(conn):
+            # Кожне слово - окремий рядок, згрупований за користувачем
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS words
+                         (
+                             user_id INTEGER NOT NULL,
+                             word_id INTEGER NOT NULL,
+                             eng     TEXT    NOT NULL,
+                             ukr     TEXT    NOT NULL,
+                             PRIMARY KEY (user_id, word_id)
+                         ) WITHOUT ROWID
+                         ''')
+
+            # Наступний ідентифікатор слова; ідентифікатори не використовуються повторно
+            conn.execute('ALTER TABLE users ADD COLUMN next_word_id INTEGER DEFAULT 1')
+
+            rows = conn.execute(
+                "SELECT user_id, words FROM users WHERE words IS NOT NULL AND words != '[]'"
+            ).fetchall()
+
+            for user_id, words_json in rows:
+                try:
+                    words = json.loads(words_json)
+                except ValueError:
+                    logging.error(f"Пошкоджений список слів користувача {user_id}, пропускаємо")
+                    continue
+                if not isinstance(words, list):
+                    logging.error(f"Список слів користувача {user_id} має неочікуваний формат, пропускаємо")
+                    continue
+
+                words = [word for word in words if _is_legacy_pair(word)]
+                conn.executemany(
+                    'INSERT INTO words (user_id, word_id, eng, ukr) VALUES (?, ?, ?, ?)',
+                    ((user_id, word_id, eng, ukr) for word_id, (eng, ukr) in enumerate(words, 1))
+                )
+                conn.execute(
+                    'UPDATE users SET next_word_id = ? WHERE user_id = ?',
+                    (len(words) + 1, user_id)
+                )
+
+            # Старий JSON більше не використовується
+            conn.execute('UPDATE users SET words = NULL')
+            conn.execute('PRAGMA user_version = 1')
+
+        logging.info(f"Міграцію слів завершено для {len(rows)} користувачів")
+
+    def _migrate_add_schedule(self, conn):
+        """Додавання стану інтервального повторення до слів"""
+        with _migration(conn):
+            conn.execute('ALTER TABLE words ADD COLUMN ease REAL NOT NULL DEFAULT 2.5')
+            conn.execute('ALTER TABLE words ADD COLUMN interval REAL NOT NULL DEFAULT 0')
+            conn.execute('ALTER TABLE words ADD COLUMN repetitions INTEGER NOT NULL DEFAULT 0')
+            conn.execute('ALTER TABLE words ADD COLUMN due_at INTEGER NOT NULL DEFAULT 0')
+
+            # Індекс для вибірки слів, які пора повторити
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_words_due ON words(user_id, due_at)')
+            conn.execute('PRAGMA user_version = 2')
+
+    def _migrate_add_word_keys(self, conn):
+        """Додавання нормалізованого ключа слова з унікальним індексом"""
+        with _migration(conn):
+            conn.execute('ALTER TABLE words ADD COLUMN eng_key TEXT')
+
+            # Наявні дублікати не видаляємо: ключ отримує лише перше з них,
+            # а в решти він лишається NULL і не заважає унікальному індексу
+            seen = set()
+            updates = []
+            for user_id, word_id, eng in conn.execute(
+                    'SELECT user_id, word_id, eng FROM words ORDER BY user_id, word_id'
+            ).fetchall():
+                key = (user_id, normalize_key(eng))
+                if key not in seen:
+                    seen.add(key)
+                    updates.append((key[1], user_id, word_id))
+
+            conn.executemany('UPDATE words SET eng_key = ? WHERE user_id = ? AND word_id = ?', updates)
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_words_key ON words(user_id, eng_key)')
+            conn.execute('PRAGMA user_version = 3')
+
+    def _migrate_add_search_index(self, conn):
+        """Триграмний повнотекстовий індекс слів і перекладів, який підтримують тригери"""
+        bits = FTS_WORD_ID_BITS
+        with _migration(conn):
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(eng, ukr, tokenize = 'trigram')")
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words
+                             WHEN new.word_id < {1 << bits}
+                         BEGIN
+                             INSERT INTO words_fts (rowid, eng, ukr)
+                             VALUES ((new.user_id << {bits}) | new.word_id, new.eng, new.ukr);
+                         END
+                         ''')
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words
+                         BEGIN
+                             DELETE FROM words_fts WHERE rowid = (old.user_id << {bits}) | old.word_id;
+                         END
+                         ''')
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_update AFTER UPDATE OF eng, ukr ON words
+                         BEGIN
+                             UPDATE words_fts SET eng = new.eng, ukr = new.ukr
+                             WHERE rowid = (old.user_id << {bits}) | old.word_id;
+                         END
+                         ''')
+
+            # Індексуємо слова, що вже є
+            conn.execute(
+                f'INSERT INTO words_fts (rowid, eng, ukr) '
+                f'SELECT (user_id << {bits}) | word_id, eng, ukr FROM words WHERE word_id < {1 << bits}'
+            )
+            conn.execute('PRAGMA user_version = 4')
+
+    def _migrate_add_word_count(self, conn):
+        """Кількість слів користувача в users.word_count, яку підтримують тригери"""
+        with _migration(conn):
+            conn.execute('ALTER TABLE users ADD COLUMN word_count INTEGER NOT NULL DEFAULT 0')
+            conn.execute('''
+                         CREATE TRIGGER IF NOT EXISTS words_count_insert AFTER INSERT ON words
+                         BEGIN
+                             UPDATE users SET word_count = word_count + 1 WHERE user_id = new.user_id;
+                         END
+                         ''')
+            conn.execute('''
+                         CREATE TRIGGER IF NOT EXISTS words_count_delete AFTER DELETE ON words
+                         BEGIN
+                             UPDATE users SET word_count = word_count - 1 WHERE user_id = old.user_id;
+                         END
+                         ''')
+            conn.execute(
+                'UPDATE users SET word_count = (SELECT COUNT(*) FROM words WHERE words.user_id = users.user_id)'
+            )
+            conn.execute('PRAGMA user_version = 5')
+
+    def _migrate_to_shared_vocab(self, conn):
+        """Перенесення тексту слів у спільний словник vocab
+
+        Кожна пара (eng, ukr) зберігається один раз у vocab, нормалізоване
+        слово - один раз у terms, а в words лишаються тільки числа. Замість
+        індексу words_fts з копією кожного слова кожного користувача
+        триграмний індекс vocab_fts будується по спільному словнику і бере
+        текст прямо з vocab (external content).
+        """
+        with _migration(conn):
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS terms
+                         (
+                             term_id INTEGER PRIMARY KEY,
+                             key     TEXT NOT NULL UNIQUE
+                         )
+                         ''')
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS vocab
+                         (
+                             vocab_id INTEGER PRIMARY KEY,
+                             term_id  INTEGER NOT NULL,
+                             eng      TEXT    NOT NULL,
+                             ukr      TEXT    NOT NULL,
+                             UNIQUE (eng, ukr)
+                         )
+                         ''')
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS vocab_fts USING fts5("
+                "eng, ukr, content = 'vocab', content_rowid = 'vocab_id', tokenize = 'trigram')"
+            )
+            # Пари в vocab не змінюються і не видаляються, тож досить тригера на вставку
+            conn.execute('''
+                         CREATE TRIGGER IF NOT EXISTS vocab_fts_insert AFTER INSERT ON vocab
+                         BEGIN
+                             INSERT INTO vocab_fts (rowid, eng, ukr) VALUES (new.vocab_id, new.eng, new.ukr);
+                         END
+                         ''')
+            for eng, ukr in conn.execute('SELECT DISTINCT eng, ukr FROM words').fetchall():
+                _intern_pair(conn, _intern_term(conn, normalize_key(eng)), eng, ukr)
+
+            conn.execute('ALTER TABLE words ADD COLUMN vocab_id INTEGER')
+            # Дублікати без eng_key (див. міграцію 3) лишаються без term_id
+            conn.execute('ALTER TABLE words ADD COLUMN term_id INTEGER')
+            conn.execute('''
+                         UPDATE words
+                         SET vocab_id = (SELECT vocab_id FROM vocab WHERE vocab.eng = words.eng AND vocab.ukr = words.ukr),
+                             term_id  = (SELECT term_id FROM terms WHERE terms.key = words.eng_key)
+                         ''')
+
+            for trigger in ('words_fts_insert', 'words_fts_delete', 'words_fts_update'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            conn.execute('DROP TABLE IF EXISTS words_fts')
+            conn.execute('DROP INDEX IF EXISTS idx_words_key')
+            for column in ('eng', 'ukr', 'eng_key'):
+                conn.execute(f'ALTER TABLE words DROP COLUMN {column}')
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_words_term ON words(user_id, term_id)')
+            # Для пошуку: пара зі словника -> слово користувача
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_words_vocab ON words(user_id, vocab_id)')
+            conn.execute('PRAGMA user_version = 6')
+
+    def _migrate_add_stats(self, conn):
+        """Лічильники і денна статистика, які оновлюються в тих самих транзакціях, що і дані
+
+        counters - загальна кількість користувачів і слів; daily_stats - додані
+        слова, повторення і показані переклади за день для кожного користувача
+        і для всіх разом (user_id = ALL_USERS). Історії до міграції немає.
+        """
+        with _migration(conn):
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS counters
+                         (
+                             name  TEXT PRIMARY KEY,
+                             value INTEGER NOT NULL DEFAULT 0
+                         ) WITHOUT ROWID
+                         ''')
+            conn.execute('''
+                         CREATE TABLE IF NOT EXISTS daily_stats
+                         (
+                             user_id     INTEGER NOT NULL,
+                             day         INTEGER NOT NULL,
+                             words_added INTEGER NOT NULL DEFAULT 0,
+                             reviews     INTEGER NOT NULL DEFAULT 0,
+                             reveals     INTEGER NOT NULL DEFAULT 0,
+                             PRIMARY KEY (user_id, day)
+                         ) WITHOUT ROWID
+                         ''')
+            conn.execute(RECOUNT_SQL)
+            conn.execute('PRAGMA user_version = 7')
+
+    def _migrate_add_shuffle(self, conn):
+        """Стан випадкового порядку слів: seed кола (NULL - по черзі) і позиція в ньому"""
+        with _migration(conn):
+            conn.execute('ALTER TABLE users ADD COLUMN shuffle_seed INTEGER')
+            conn.execute('ALTER TABLE users ADD COLUMN shuffle_position INTEGER NOT NULL DEFAULT 0')
+            conn.execute('PRAGMA user_version = 8')
+
+    def _migrate_to_user_search_index(self, conn):
+        """Триграмний індекс слів кожного користувача без копії тексту
+
+        Спільний vocab_fts змушував кожен пошук перебирати збіги всіх
+        користувачів. words_fts знову індексує слова за rowid = (user_id <<
+        FTS_WORD_ID_BITS) | word_id, тож пошук обмежується діапазоном rowid
+        користувача, але без власного вмісту (content = ''): текст береться
+        з vocab. Для видалення з такого індексу потрібні ті самі значення, тож
+        тригери передають пару з vocab, яка не змінюється.
+        """
+        bits = FTS_WORD_ID_BITS
+        with _migration(conn):
+            conn.execute('DROP TRIGGER IF EXISTS vocab_fts_insert')
+            conn.execute('DROP TABLE IF EXISTS vocab_fts')
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5("
+                "eng, ukr, content = '', tokenize = 'trigram')"
+            )
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words
+                             WHEN new.word_id < {1 << bits}
+                         BEGIN
+                             INSERT INTO words_fts (rowid, eng, ukr)
+                             SELECT (new.user_id << {bits}) | new.word_id, eng, ukr
+                             FROM vocab WHERE vocab_id = new.vocab_id;
+                         END
+                         ''')
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words
+                             WHEN old.word_id < {1 << bits}
+                         BEGIN
+                             INSERT INTO words_fts (words_fts, rowid, eng, ukr)
+                             SELECT 'delete', (old.user_id << {bits}) | old.word_id, eng, ukr
+                             FROM vocab WHERE vocab_id = old.vocab_id;
+                         END
+                         ''')
+            conn.execute(f'''
+                         CREATE TRIGGER IF NOT EXISTS words_fts_update AFTER UPDATE OF vocab_id ON words
+                             WHEN old.word_id < {1 << bits} AND old.vocab_id IS NOT new.vocab_id
+                         BEGIN
+                             INSERT INTO words_fts (words_fts, rowid, eng, ukr)
+                             SELECT 'delete', (old.user_id << {bits}) | old.word_id, eng, ukr
+                             FROM vocab WHERE vocab_id = old.vocab_id;
+                             INSERT INTO words_fts (rowid, eng, ukr)
+                             SELECT (new.user_id << {bits}) | new.word_id, eng, ukr
+                             FROM vocab WHERE vocab_id = new.vocab_id;
+                         END
+                         ''')
+
+            # Індексуємо слова, що вже є
+            conn.execute(
+                f'INSERT INTO words_fts (rowid, eng, ukr) '
+                f'SELECT (w.user_id << {bits}) | w.word_id, v.eng, v.ukr '
+                f'FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id WHERE w.word_id < {1 << bits}'
+            )
+            conn.execute('PRAGMA user_version = 9')
+
     def get_user_data(self, user_id):
         """Отримання даних користувача з БД"""
-        with self.lock:
-            try:
-                with sqlite3.connect(self.db_name) as conn:
-                    cursor = conn.cursor()
+        # Читання не бере блокування запису, тож не чекає на інших користувачів
+        try:
+            with self._read() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'SELECT current_index, shuffle_seed, shuffle_position FROM users WHERE user_id = ?',
+                    (user_id,)
+                )
+                result = cursor.fetchone()
+
+                if result:
+                    # Лише числа: текст слів береться зі спільного словника (get_vocab)
                     cursor.execute(
-                        'SELECT words, current_index FROM users WHERE user_id = ?',
+                        'SELECT word_id, vocab_id, ease, interval, repetitions, due_at '
+                        'FROM words WHERE user_id = ? ORDER BY word_id',
                         (user_id,)
                     )
-                    result = cursor.fetchone()
-
-                    if result:
-                        words_json, current_index = result
-                        return {
-                            'words': json.loads(words_json) if words_json else [],
-                            'current_index': current_index or 0
-                        }
-                    return None
-            except Exception as e:
-                logging.error(f"Помилка при отриманні даних користувача {user_id}: {e}")
+                    deck = Deck()
+                    columns = (deck.word_ids, deck.vocab_ids, deck.ease, deck.interval, deck.repetitions, deck.due_at)
+                    for values, column in zip(columns, zip(*cursor.fetchall())):
+                        values.extend(column)
+
+                    return {
+                        'deck': deck,  # Слова і стан їх повторення
+                        'current_index': result[0] or 0,
+                        'shuffle': None if result[1] is None else Shuffle(result[1], result[2])
+                    }
                 return None
+        except Exception as e:
+            logging.error(f"Помилка при отриманні даних користувача {user_id}: {e}")
+            return None
 
-    def save_user_data(self, user_id, data):
-        """Збереження даних користувача в БД"""
-        with self.lock:
-            try:
-                with sqlite3.connect(self.db_name) as conn:
-                    cursor = conn.cursor()
+    def get_vocab(self, vocab_ids):
+        """Пари слів зі спільного словника: {vocab_id: (eng, ukr)}"""
+        vocab_ids = list(vocab_ids)
+        pairs = {}
+        try:
+            with self._read() as conn:
+                for i in range(0, len(vocab_ids), MAX_QUERY_PARAMS):
+                    chunk = vocab_ids[i:i + MAX_QUERY_PARAMS]
+                    rows = conn.execute(
+                        f"SELECT vocab_id, eng, ukr FROM vocab WHERE vocab_id IN ({', '.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    pairs.update((vocab_id, (eng, ukr)) for vocab_id, eng, ukr in rows)
+            return pairs
+        except Exception as e:
+            logging.error(f"Помилка при отриманні {len(vocab_ids)} слів словника: {e}")
+            return None
 
-                    words_json = json.dumps(data['words'], ensure_ascii=False)
+    def create_user(self, user_id):
+        """Створення запису користувача без слів"""
+        try:
+            with self._write() as conn:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO users (user_id, words, current_index) VALUES (?, NULL, 0)',
+                    (user_id,)
+                )
+                _add_counter(conn, 'users', cursor.rowcount)
+        except Exception as e:
+            logging.error(f"Помилка при створенні користувача {user_id}: {e}")
 
-                    cursor.execute('''
-                    INSERT OR REPLACE INTO users 
-                    (user_id, words, current_index, updated_at)
-                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (user_id, words_json, data['current_index']))
+    def set_current_index(self, user_id, current_index):
+        """Збереження позиції поточного слова"""
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    'UPDATE users SET current_index = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                    (current_index, user_id)
+                )
+        except Exception as e:
+            logging.error(f"Помилка при збереженні позиції користувача {user_id}: {e}")
 
-                    conn.commit()
-            except Exception as e:
-                logging.error(f"Помилка при збереженні даних користувача {user_id}: {e}")
+    def save_cursors(self, cursors):
+        """Збереження позицій кількох користувачів однією транзакцією
 
-    def get_user_count(self):
-        """Отримати кількість користувачів"""
-        with sqlite3.connect(self.db_name) as conn:
+        cursors = [(user_id, current_index, shuffle_seed, shuffle_position, reveals), ...]:
+        shuffle_seed None - порядок по черзі, reveals - показаних перекладів з минулого запису.
+        """
+        try:
+            with self._write() as conn:
+                conn.executemany(
+                    'UPDATE users SET current_index = ?, shuffle_seed = ?, shuffle_position = ?, '
+                    'updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                    (
+                        (current_index, shuffle_seed, shuffle_position, user_id)
+                        for user_id, current_index, shuffle_seed, shuffle_position, _ in cursors
+                    )
+                )
+                _add_daily(conn, [(user_id, 0, 0, cursor[-1]) for user_id, *cursor in cursors])
+        except Exception as e:
+            logging.error(f"Помилка при збереженні позицій {len(cursors)} користувачів: {e}")
+
+    def add_words(self, user_id, words, update_duplicates=False):
+        """Додавання слів в кінець списку з пропуском дублікатів
+
+        Дублікати шукаються за нормалізованим англійським словом серед words і
+        серед слів користувача (унікальний індекс (user_id, term_id)), в тій
+        самій транзакції, що і запис. Якщо update_duplicates, наявне слово
+        отримує новий переклад, інакше пропускається. Дублікат усередині words
+        рахується пропущеним в обох режимах (при оновленні перекладу рядок
+        замінює попередній). Кожна пара (eng, ukr)
+        зберігається в спільній таблиці vocab один раз для всіх користувачів;
+        пари, що перестали використовуватись, не видаляються.
+        Повертає {'added': [(word_id, vocab_id), ...], 'updated': [(word_id,
+        vocab_id), ...], 'skipped': кількість, 'vocab': {vocab_id: (eng, ukr)}}
+        або None при помилці.
+        """
+        fresh = {}  # Нормалізоване слово -> (eng, ukr)
+        skipped = 0
+        for eng, ukr in words:
+            key = normalize_key(eng)
+            if key not in fresh:
+                fresh[key] = (eng, ukr)
+                continue
+            if update_duplicates:
+                fresh[key] = (fresh[key][0], ukr)
+            skipped += 1
+
+        try:
+            with self._write() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT next_word_id FROM users WHERE user_id = ?', (user_id,))
+                next_id = first_id = cursor.fetchone()[0] or 1
+                added, updated, vocab = [], [], {}
+
+                for key, (eng, ukr) in fresh.items():
+                    term_id = _intern_term(conn, key)
+                    existing = cursor.execute(
+                        'SELECT w.word_id, v.eng, v.ukr FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id '
+                        'WHERE w.user_id = ? AND w.term_id = ?',
+                        (user_id, term_id)
+                    ).fetchone()
+                    if existing is not None:
+                        if not update_duplicates or existing[2] == ukr:
+                            skipped += 1
+                            continue
+                        # Англійське слово лишається таким, як було
+                        eng = existing[1]
+
+                    vocab_id = _intern_pair(conn, term_id, eng, ukr)
+                    vocab[vocab_id] = (eng, ukr)
+                    if existing is not None:
+                        updated.append((existing[0], vocab_id))
+                    else:
+                        added.append((next_id, vocab_id, term_id))
+                        next_id += 1
+
+                cursor.executemany(
+                    'INSERT INTO words (user_id, word_id, vocab_id, term_id) VALUES (?, ?, ?, ?)',
+                    ((user_id, word_id, vocab_id, term_id) for word_id, vocab_id, term_id in added)
+                )
+                cursor.executemany(
+                    'UPDATE words SET vocab_id = ? WHERE user_id = ? AND word_id = ?',
+                    ((vocab_id, user_id, word_id) for word_id, vocab_id in updated)
+                )
+                cursor.execute(
+                    'UPDATE users SET next_word_id = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                    (next_id, user_id)
+                )
+                _add_counter(conn, 'words', len(added))
+                _add_daily(conn, [(user_id, len(added), 0, 0)])
+                if first_id < FTS_WORD_ID_LIMIT < next_id:
+                    logging.warning(
+                        f"Ідентифікатори слів користувача {user_id} перейшли межу {FTS_WORD_ID_LIMIT}: "
+                        f"нові слова не потрапляють у повнотекстовий індекс і шукаються перебором"
+                    )
+                return {
+                    'added': [(word_id, vocab_id) for word_id, vocab_id, _ in added],
+                    'updated': updated,
+                    'skipped': skipped,
+                    'vocab': vocab,
+                }
+        except Exception as e:
+            logging.error(f"Помилка при додаванні слів користувача {user_id}: {e}")
+            return None
+
+    def save_review(self, user_id, word_id, card):
+        """Збереження стану повторення одного слова"""
+        try:
+            with self._write() as conn:
+                conn.execute(
+                    'UPDATE words SET ease = ?, interval = ?, repetitions = ?, due_at = ? '
+                    'WHERE user_id = ? AND word_id = ?',
+                    (card.ease, card.interval, card.repetitions, card.due_at, user_id, word_id)
+                )
+                _add_daily(conn, [(user_id, 0, 1, 0)])
+        except Exception as e:
+            logging.error(f"Помилка при збереженні повторення слова користувача {user_id}: {e}")
+
+    def delete_word(self, user_id, word_id, current_index):
+        """Видалення одного слова разом з оновленням позиції"""
+        try:
+            with self._write() as conn:
+                cursor = conn.execute(
+                    'DELETE FROM words WHERE user_id = ? AND word_id = ?',
+                    (user_id, word_id)
+                )
+                _add_counter(conn, 'words', -cursor.rowcount)
+                conn.execute(
+                    'UPDATE users SET current_index = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                    (current_index, user_id)
+                )
+        except Exception as e:
+            logging.error(f"Помилка при видаленні слова користувача {user_id}: {e}")
+
+    def delete_all_words(self, user_id):
+        """Видалення всіх слів користувача"""
+        try:
+            with self._write() as conn:
+                cursor = conn.execute('DELETE FROM words WHERE user_id = ?', (user_id,))
+                _add_counter(conn, 'words', -cursor.rowcount)
+                # Випадковий порядок лишається увімкненим, але починає нове коло
+                conn.execute(
+                    'UPDATE users SET current_index = 0, shuffle_position = 0, '
+                    'shuffle_seed = CASE WHEN shuffle_seed IS NULL THEN NULL ELSE 0 END, '
+                    'updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+                    (user_id,)
+                )
+        except Exception as e:
+            logging.error(f"Помилка при видаленні слів користувача {user_id}: {e}")
+
+    def get_words_page(self, user_id, first_word_id, page_size):
+        """Сторінка слів користувача, що починається зі слова first_word_id (або наступного за ним)
+
+        Читає лише page_size слів за первинним ключем (keyset-пагінація), а
+        кількість слів бере з users.word_count, тож вартість не залежить від
+        розміру словника. Якщо після first_word_id слів уже немає, повертає
+        останню сторінку. Результат: {'words': [(word_id, [eng, ukr]), ...],
+        'total': кількість слів, 'start': позиція першого слова, якщо відома,
+        інакше None, 'prev_id' / 'next_id': початок сусідніх сторінок або None}.
+        """
+        try:
+            with self._read() as conn:
+                row = conn.execute('SELECT word_count FROM users WHERE user_id = ?', (user_id,)).fetchone()
+                total = row[0] if row else 0
+                if not total:
+                    return {'words': [], 'total': 0, 'start': 0, 'prev_id': None, 'next_id': None}
+
+                start = None
+                rows = conn.execute(
+                    'SELECT w.word_id, v.eng, v.ukr FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id '
+                    'WHERE w.user_id = ? AND w.word_id >= ? ORDER BY w.word_id LIMIT ?',
+                    (user_id, first_word_id, page_size + 1)
+                ).fetchall()
+                if not rows:
+                    # Сторінка зникла - показуємо останню
+                    start = (total - 1) // page_size * page_size
+                    rows = conn.execute(
+                        'SELECT w.word_id, v.eng, v.ukr FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id '
+                        'WHERE w.user_id = ? ORDER BY w.word_id LIMIT ? OFFSET ?',
+                        (user_id, page_size + 1, start)
+                    ).fetchall()
+
+                # Попередня сторінка - page_size слів перед поточною (або від початку)
+                before = conn.execute(
+                    'SELECT word_id FROM words WHERE user_id = ? AND word_id < ? '
+                    'ORDER BY word_id DESC LIMIT ?',
+                    (user_id, rows[0][0], page_size)
+                ).fetchall()
+                prev_id = None
+                if before:
+                    prev_id = before[-1][0] if len(before) == page_size else 0
+
+                return {
+                    'words': [(word_id, [eng, ukr]) for word_id, eng, ukr in rows[:page_size]],
+                    'total': total,
+                    'start': start if before else 0,
+                    'prev_id': prev_id,
+                    'next_id': rows[page_size][0] if len(rows) > page_size else None,
+                }
+        except Exception as e:
+            logging.error(f"Помилка при отриманні сторінки слів користувача {user_id}: {e}")
+            return None
+
+    def search_words(self, user_id, text, after_id=0, limit=10):
+        """Слова користувача, що містять text у слові чи перекладі
+
+        Повертає до limit пар (word_id, [eng, ukr]) з word_id > after_id за
+        зростанням word_id. Запити від FTS_MIN_QUERY символів шукаються за
+        триграмним індексом у діапазоні rowid користувача (текст - зі
+        спільного словника), коротші - перебором лише його слів. Слова з
+        word_id від FTS_WORD_ID_LIMIT в індексі немає, тож після індексу вони
+        доперебираються. Регістр ігнорується в обох випадках.
+        """
+        try:
+            with self._read() as conn:
+                rows = []
+                scan_after = after_id
+                if len(text) >= FTS_MIN_QUERY:
+                    if after_id < FTS_WORD_ID_LIMIT - 1:
+                        base = user_id << FTS_WORD_ID_BITS
+                        # Запит у лапках - фраза з триграм, тобто пошук підрядка
+                        phrase = '"' + text.replace('"', '""') + '"'
+                        rows = conn.execute(
+                            'SELECT w.word_id, v.eng, v.ukr FROM words_fts f '
+                            'CROSS JOIN words w ON w.user_id = ? AND w.word_id = f.rowid - ? '
+                            'CROSS JOIN vocab v ON v.vocab_id = w.vocab_id '
+                            'WHERE words_fts MATCH ? AND f.rowid > ? AND f.rowid < ? ORDER BY f.rowid LIMIT ?',
+                            (user_id, base, phrase, base + after_id, base + FTS_WORD_ID_LIMIT, limit)
+                        ).fetchall()
+                    scan_after = max(after_id, FTS_WORD_ID_LIMIT - 1)
+
+                if len(rows) < limit:
+                    # Короткі запити і слова поза індексом (за первинним ключем це лише діапазон)
+                    pattern = '%' + text.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                    rows += conn.execute(
+                        "SELECT w.word_id, v.eng, v.ukr FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id "
+                        "WHERE w.user_id = ? AND w.word_id > ? "
+                        "AND (casefold(v.eng) LIKE ? ESCAPE '\\' OR casefold(v.ukr) LIKE ? ESCAPE '\\') "
+                        "ORDER BY w.word_id LIMIT ?",
+                        (user_id, scan_after, pattern, pattern, limit - len(rows))
+                    ).fetchall()
+                return [(word_id, [eng, ukr]) for word_id, eng, ukr in rows]
+        except Exception as e:
+            logging.error(f"Помилка при пошуку слів користувача {user_id}: {e}")
+            return []
+
+    def export_words(self, user_id, after_id=0, limit=1000):
+        """До limit слів користувача з word_id > after_id: [(word_id, eng, ukr), ...]"""
+        try:
+            with self._read() as conn:
+                return conn.execute(
+                    'SELECT w.word_id, v.eng, v.ukr FROM words w JOIN vocab v ON v.vocab_id = w.vocab_id '
+                    'WHERE w.user_id = ? AND w.word_id > ? ORDER BY w.word_id LIMIT ?',
+                    (user_id, after_id, limit)
+                ).fetchall()
+        except Exception as e:
+            logging.error(f"Помилка при експорті слів користувача {user_id}: {e}")
+            return None
+
+    def backup(self, target, pages=BACKUP_STEP_PAGES, pause=BACKUP_STEP_PAUSE):
+        """Онлайн-копія БД у файл target кроками по pages сторінок
+
+        Джерело - з'єднання запису: зміни, записані через нього під час
+        копіювання, одразу потрапляють і в копію, тож вона не починається
+        заново. Кожен крок виконується під замком запису, а між кроками замок
+        відпускається на pause секунд, тож запис чекає не довше одного кроку.
+        Повертає {'files': [target], 'pages': кількість сторінок, 'seconds': тривалість}.
+        """
+        started = time.perf_counter()
+        total = 0
+
+        def progress(status, remaining, pagecount):
+            nonlocal total
+            total = pagecount
+            self.lock.release()
+            try:
+                time.sleep(pause)
+            finally:
+                self.lock.acquire()
+
+        try:
+            target_conn = sqlite3.connect(target)
+            try:
+                with self.lock:
+                    self._conn.backup(target_conn, pages=pages, progress=progress)
+            finally:
+                target_conn.close()
+            return {'files': [target], 'pages': total, 'seconds': time.perf_counter() - started}
+        except Exception as e:
+            logging.error(f"Помилка при створенні резервної копії {target}: {e}")
+            return None
+
+    def count_due_words(self, user_id, now):
+        """Кількість слів, які пора повторити (за індексом idx_words_due)"""
+        with self._read() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM users')
+            cursor.execute(
+                'SELECT COUNT(*) FROM words WHERE user_id = ? AND due_at <= ?',
+                (user_id, now)
+            )
             return cursor.fetchone()[0]
 
+    def get_user_count(self):
+        """Отримати кількість користувачів"""
+        return self.get_counters()['users']
+
+    def get_counters(self):
+        """Загальні лічильники: {'users': ..., 'words': ...}"""
+        with self._read() as conn:
+            return dict(conn.execute('SELECT name, value FROM counters'))
+
+    def get_daily_stats(self, user_id, first_day):
+        """Денна статистика користувача (або ALL_USERS) з дня first_day
+
+        Повертає {day: {'words_added': ..., 'reviews': ..., 'reveals': ...}}
+        лише для днів, коли щось відбувалось (діапазон первинного ключа).
+        """
+        with self._read() as conn:
+            rows = conn.execute(
+                'SELECT day, words_added, reviews, reveals FROM daily_stats WHERE user_id = ? AND day >= ?',
+                (user_id, first_day)
+            )
+            return {
+                day: {'words_added': words_added, 'reviews': reviews, 'reveals': reveals}
+                for day, words_added, reviews, reveals in rows
+            }
+
+    def close(self):
+        """Закриття з'єднань з БД"""
+        with self.lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+
+class ShardedDatabaseManager:
+    """Кілька файлів БД, між якими користувачі розподілені за хешем user_id
+
+    Кожен шард - окремий DatabaseManager з власним з'єднанням запису і
+    пулом читання, тож записи різних користувачів у різних шардах не чекають
+    один на одного. Дані користувача завжди лежать в одному шарді; запити,
+    що стосуються всіх користувачів, виконуються в кожному шарді і
+    підсумовуються. Спільний словник у кожному шарді свій, тож назовні
+    vocab_id перетворюється на глобальний: vocab_id * кількість шардів +
+    номер шарду. Кількість шардів задається один раз: reshard.py лише
+    розбиває однофайлову БД на шарди, а змінити кількість наявних шардів
+    (N -> M) не вміє.
+    """
+
+    def __init__(self, db_names, readers=4):
+        self.readers = readers
+        self.shards = [DatabaseManager(db_name, readers) for db_name in db_names]
+
+    def shard_index(self, user_id):
+        return shard_index(user_id, len(self.shards))
+
+    def _shard(self, user_id):
+        return self.shards[self.shard_index(user_id)]
+
+    def _global_vocab_id(self, index, vocab_id):
+        return vocab_id * len(self.shards) + index
+
+    def split_by_shard(self, items):
+        """Розкласти [(user_id, ...), ...] за шардами: {номер шарду: [...]}"""
+        batches = {}
+        for item in items:
+            batches.setdefault(self.shard_index(item[0]), []).append(item)
+        return batches
+
+    def get_user_data(self, user_id):
+        index = self.shard_index(user_id)
+        data = self.shards[index].get_user_data(user_id)
+        if data:
+            deck = data['deck']
+            deck.vocab_ids = array('I', (self._global_vocab_id(index, vocab_id) for vocab_id in deck.vocab_ids))
+        return data
+
+    def get_vocab(self, vocab_ids):
+        pairs = {}
+        by_shard = {}
+        for vocab_id in vocab_ids:
+            by_shard.setdefault(vocab_id % len(self.shards), []).append(vocab_id // len(self.shards))
+        for index, local_ids in by_shard.items():
+            shard_pairs = self.shards[index].get_vocab(local_ids)
+            if shard_pairs is None:
+                return None
+            pairs.update((self._global_vocab_id(index, vocab_id), pair) for vocab_id, pair in shard_pairs.items())
+        return pairs
+
+    def create_user(self, user_id):
+        self._shard(user_id).create_user(user_id)
+
+    def set_current_index(self, user_id, current_index):
+        self._shard(user_id).set_current_index(user_id, current_index)
+
+    def save_cursors(self, cursors):
+        for index, batch in self.split_by_shard(cursors).items():
+            self.shards[index].save_cursors(batch)
+
+    def add_words(self, user_id, words, update_duplicates=False):
+        index = self.shard_index(user_id)
+        result = self.shards[index].add_words(user_id, words, update_duplicates)
+        if result is not None:
+            for key in ('added', 'updated'):
+                result[key] = [
+                    (word_id, self._global_vocab_id(index, vocab_id)) for word_id, vocab_id in result[key]
+                ]
+            result['vocab'] = {
+                self._global_vocab_id(index, vocab_id): pair for vocab_id, pair in result['vocab'].items()
+            }
+        return result
+
+    def save_review(self, user_id, word_id, card):
+        self._shard(user_id).save_review(user_id, word_id, card)
+
+    def delete_word(self, user_id, word_id, current_index):
+        self._shard(user_id).delete_word(user_id, word_id, current_index)
+
+    def delete_all_words(self, user_id):
+        self._shard(user_id).delete_all_words(user_id)
+
+    def get_words_page(self, user_id, first_word_id, page_size):
+        return self._shard(user_id).get_words_page(user_id, first_word_id, page_size)
+
+    def search_words(self, user_id, text, after_id=0, limit=10):
+        return self._shard(user_id).search_words(user_id, text, after_id, limit)
+
+    def export_words(self, user_id, after_id=0, limit=1000):
+        return self._shard(user_id).export_words(user_id, after_id, limit)
+
+    def backup(self, target, pages=BACKUP_STEP_PAGES, pause=BACKUP_STEP_PAUSE):
+        """Копії шардів по черзі у файли shard_paths(target)"""
+        result = {'files': [], 'pages': 0, 'seconds': 0.0}
+        for shard, shard_target in zip(self.shards, shard_paths(target, len(self.shards))):
+            shard_result = shard.backup(shard_target, pages, pause)
+            if shard_result is None:
+                return None
+            for key, value in shard_result.items():
+                result[key] += value
+        return result
+
+    def count_due_words(self, user_id, now):
+        return self._shard(user_id).count_due_words(user_id, now)
+
+    def get_user_count(self):
+        return self.get_counters()['users']
+
+    def get_counters(self):
+        counters = {}
+        for shard in self.shards:
+            for name, value in shard.get_counters().items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    def get_daily_stats(self, user_id, first_day):
+        if user_id != ALL_USERS:
+            return self._shard(user_id).get_daily_stats(user_id, first_day)
+        totals = {}
+        for shard in self.shards:
+            for day, stats in shard.get_daily_stats(ALL_USERS, first_day).items():
+                day_totals = totals.setdefault(day, dict.fromkeys(stats, 0))
+                for name, value in stats.items():
+                    day_totals[name] += value
+        return totals
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+
+
+class AsyncDatabaseManager:
+    """Асинхронний доступ до DatabaseManager для обробників asyncio
+
+    Запити виконуються поза циклом подій: записи - в одному окремому потоці
+    на файл БД (по черзі, як і вимагає SQLite), читання - в невеликому пулі
+    потоків, тож вони не чекають на запис. db - DatabaseManager або
+    ShardedDatabaseManager; у другому випадку записи в різні шарди йдуть
+    паралельно.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._sharded = isinstance(db, ShardedDatabaseManager)
+        shards = len(db.shards) if self._sharded else 1
+        self._writers = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'db-writer-{index}') for index in range(shards)
+        ]
+        # По потоку на кожне з'єднання читання в пулах DatabaseManager
+        self._readers = ThreadPoolExecutor(max_workers=db.readers * shards, thread_name_prefix='db-reader')
+
+    async def _run(self, executor, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(timed_query, func, *args))
+
+    async def _read(self, func, *args):
+        """Виконати читання в пулі потоків читання"""
+        return await self._run(self._readers, func, *args)
+
+    async def _write(self, func, user_id, *args):
+        """Поставити запис у чергу потоку запису шарду користувача"""
+        writer = self._writers[self.db.shard_index(user_id) if self._sharded else 0]
+        return await self._run(writer, func, user_id, *args)
+
+    async def get_user_data(self, user_id):
+        return await self._read(self.db.get_user_data, user_id)
+
+    async def get_vocab(self, vocab_ids):
+        return await self._read(self.db.get_vocab, vocab_ids)
+
+    async def get_words_page(self, user_id, first_word_id, page_size):
+        return await self._read(self.db.get_words_page, user_id, first_word_id, page_size)
+
+    async def search_words(self, user_id, text, after_id=0, limit=10):
+        return await self._read(self.db.search_words, user_id, text, after_id, limit)
+
+    async def export_words(self, user_id, after_id=0, limit=1000):
+        return await self._read(self.db.export_words, user_id, after_id, limit)
+
+    async def backup(self, target):
+        # Окремий потік: копіювання триває довго, а потік запису має лишатися вільним
+        return await asyncio.to_thread(timed_query, self.db.backup, target)
+
+    async def count_due_words(self, user_id, now):
+        return await self._read(self.db.count_due_words, user_id, now)
+
+    async def get_user_count(self):
+        return await self._read(self.db.get_user_count)
+
+    async def get_counters(self):
+        return await self._read(self.db.get_counters)
+
+    async def get_daily_stats(self, user_id, first_day):
+        return await self._read(self.db.get_daily_stats, user_id, first_day)
+
+    async def create_user(self, user_id):
+        return await self._write(self.db.create_user, user_id)
+
+    async def set_current_index(self, user_id, current_index):
+        return await self._write(self.db.set_current_index, user_id, current_index)
+
+    async def save_cursors(self, cursors):
+        if not self._sharded:
+            return await self._run(self._writers[0], self.db.save_cursors, cursors)
+        # Кожен шард записує свою частину у власному потоці
+        await asyncio.gather(*(
+            self._run(self._writers[index], self.db.shards[index].save_cursors, batch)
+            for index, batch in self.db.split_by_shard(cursors).items()
+        ))
+
+    async def add_words(self, user_id, words, update_duplicates=False):
+        return await self._write(self.db.add_words, user_id, words, update_duplicates)
+
+    async def save_review(self, user_id, word_id, card):
+        return await self._write(self.db.save_review, user_id, word_id, card)
+
+    async def delete_word(self, user_id, word_id, current_index):
+        return await self._write(self.db.delete_word, user_id, word_id, current_index)
+
+    async def delete_all_words(self, user_id):
+        return await self._write(self.db.delete_all_words, user_id)
+
     def close(self):
-        """Закриття з'єднання з БД"""
-        # SQLite автоматично закриває з'єднання при використанні context manager
-        pass
\ No newline at end of file
+        """Дочекатися черги запитів і закрити БД"""
+        for writer in self._writers:
+            writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Методи, для яких у черзі лишається тільки останній вміст повідомлення
+COALESCED_METHODS = frozenset({'editMessageText', 'editMessageReplyMarkup'})
+# Скільки відер чатів тримати, перш ніж прибрати ті, що давно не використовувались
+MAX_IDLE_BUCKETS = 10000
+
+
+def retry_after_seconds(error):
+    """RetryAfter.retry_after - число секунд або timedelta залежно від налаштувань PTB"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TokenBucket:
+    """Відро токенів: rate запитів за секунду з запасом burst"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'blocked_until', 'lock')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # До цього часу Telegram просив не надсилати (429)
+        self.lock = asyncio.Lock()
+
+    def _delay(self):
+        """Скільки чекати до наступного запиту; 0 - токен узято"""
+        now = time.monotonic()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        # Замок робить чергу чату FIFO: запити відправляються в порядку надходження
+        async with self.lock:
+            while (delay := self._delay()) > 0:
+                await asyncio.sleep(delay)
+
+    def idle(self):
+        return not self.lock.locked() and self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class FloodControlLimiter(BaseRateLimiter):
+    """Обмеження вихідних запитів: відро токенів на чат і загальне відро
+
+    Запити до чату чекають на свій токен, не затримуючи інші чати; після
+    429 (RetryAfter) паузу витримує лише той чат, якого вона стосується.
+    Запити, не прив'язані до чату, не обмежуються. Редагування повідомлень
+    не чекають на відправку: бот одразу отримує True, а якщо до відправки
+    те саме повідомлення редагується ще раз, відправляється лише останній
+    вміст. Редагування одного повідомлення відправляються по одному: поки
+    попереднє в дорозі, нове лише чекає (замінюючи ще не відправлене), тож
+    старіший вміст не може прийти після новішого. Помилки таких редагувань
+    записуються в лог.
+    """
+
+    def __init__(self, chat_rate=1.0, chat_burst=3, global_rate=30.0, max_retries=3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}  # chat_id -> TokenBucket
+        self._edits = {}  # (chat_id, message_id) -> останній ще не відправлений (callback, args, kwargs)
+        self._editing = set()  # Повідомлення, редагування яких зараз відправляє задача
+        self._tasks = set()
+        self._waiting = 0
+
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_IDLE_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _acquire(self, bucket):
+        """Чекати на токен чату, а потім на загальний"""
+        self._waiting += 1
+        try:
+            await bucket.acquire()
+            await self._global.acquire()
+        finally:
+            self._waiting -= 1
+
+    async def _send(self, chat_id, take_request):
+        """Відправка з урахуванням відер і повтором після RetryAfter
+
+        take_request() викликається, коли настала черга, і повертає
+        (callback, args, kwargs) - для редагувань це найсвіжіший вміст.
+        """
+        bucket = self._bucket(chat_id)
+        await self._acquire(bucket)
+        callback, args, kwargs = take_request()
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._acquire(bucket)
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                bucket.blocked_until = time.monotonic() + retry_after_seconds(e)
+                logging.warning(f"Telegram просить зачекати {retry_after_seconds(e)} с (чат {chat_id})")
+
+    async def _send_edits(self, key):
+        """Відправка редагувань повідомлення по одному, щоразу найсвіжішого вмісту"""
+        try:
+            while key in self._edits:
+                try:
+                    await self._send(key[0], lambda: self._edits.pop(key))
+                except Exception as e:
+                    logging.error(f"Помилка при редагуванні повідомлення {key}: {e}")
+        finally:
+            self._editing.discard(key)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        message_id = data.get('message_id')
+
+        # Запити без чату (answerCallbackQuery, getMe, ...) під ліміти повідомлень не підпадають
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+
+        if endpoint in COALESCED_METHODS and chat_id is not None and message_id is not None:
+            key = (chat_id, message_id)
+            if key in self._edits:
+                self.coalesced += 1
+            self._edits[key] = (callback, args, kwargs)
+            if key not in self._editing:
+                self._editing.add(key)
+                task = asyncio.create_task(self._send_edits(key))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return True
+
+        return await self._send(chat_id, lambda: (callback, args, kwargs))
+
+    def stats(self):
+        """Глибина черги і лічильники"""
+        return {
+            'waiting': self._waiting,
+            'pending_edits': len(self._edits),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        """Дочекатися відправки відкладених редагувань"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
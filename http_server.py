@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from http import HTTPStatus
+
+# Максимальний розмір заголовків і тіла запиту (байти)
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+# Скільки секунд тримати відкрите з'єднання без запитів
+KEEP_ALIVE_TIMEOUT = 75
+
+
+class Request:
+    """HTTP-запит: метод, шлях, заголовки (ключі в нижньому регістрі) і тіло"""
+    __slots__ = ('method', 'path', 'headers', 'body')
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class HttpServer:
+    """Мінімальний HTTP/1.1-сервер на asyncio (вебхук, перевірка стану, метрики)
+
+    Обробник маршруту отримує Request і повертає (статус, content-type, тіло).
+    stop() перестає приймати з'єднання і чекає, доки оброблюються запити,
+    що вже надійшли.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._routes = {}  # (метод, шлях) -> обробник
+        self._server = None
+        self._connections = set()
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def route(self, method, path):
+        """Декоратор: зареєструвати обробник для методу і шляху"""
+        def decorator(handler):
+            self._routes[(method, path)] = handler
+            return handler
+        return decorator
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Порт 0 - вибрати вільний; запам'ятовуємо справжній
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"HTTP-сервер слухає {self.host}:{self.port}")
+
+    async def stop(self):
+        """Перестати приймати з'єднання і дочекатися запитів, що оброблюються"""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._idle.wait()
+        # Закриваємо з'єднання, що чекають на наступний запит
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while self._server is not None and self._server.is_serving():
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ValueError:
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST, 'text/plain', b'bad request', False)
+                    break
+                if request is None:
+                    break
+
+                self._in_flight += 1
+                self._idle.clear()
+                try:
+                    status, content_type, body = await self._dispatch(request)
+                    keep_alive = (
+                        request.headers.get('connection', '').lower() != 'close'
+                        and self._server is not None and self._server.is_serving()
+                    )
+                    await self._write_response(writer, status, content_type, body, keep_alive)
+                finally:
+                    self._in_flight -= 1
+                    if not self._in_flight:
+                        self._idle.set()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Читання одного запиту; None, якщо клієнт закрив з'єднання"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise ValueError("Завеликі заголовки")
+        if len(head) > MAX_HEADER_SIZE:
+            raise ValueError("Завеликі заголовки")
+
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = request_line.split(' ', 2)
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0'))
+        if length < 0 or length > MAX_BODY_SIZE:
+            raise ValueError("Завелике тіло запиту")
+        body = await reader.readexactly(length) if length else b''
+
+        path = target.split('?', 1)[0]
+        return Request(method, path, headers, body)
+
+    async def _dispatch(self, request):
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, 'text/plain', b'method not allowed'
+            return HTTPStatus.NOT_FOUND, 'text/plain', b'not found'
+
+        try:
+            return await handler(request)
+        except Exception as e:
+            logging.error(f"Помилка при обробці HTTP-запиту {request.method} {request.path}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, 'text/plain', b'internal error'
+
+    @staticmethod
+    async def _write_response(writer, status, content_type, body, keep_alive):
+        status = HTTPStatus(status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
@@ -1,7 +1,27 @@
+import asyncio
 import atexit
+import csv
+import hmac
+import json
+import logging
+import signal
+import tempfile
+import time
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import urlsplit
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
-from db_manager import DatabaseManager
+from db_manager import DatabaseManager, ShardedDatabaseManager, AsyncDatabaseManager, ALL_USERS, shard_paths, today
+from user_store import UserStore
+from render_cache import RenderCache
+from callback_router import CallbackRouter, callback_data
+from http_server import HttpServer
+import metrics
+from metrics import Gauge, timed_handler
+from update_processor import UserOrderedUpdateProcessor
+from flood_control import FloodControlLimiter
+from scheduler import review, ReviewQueue, Shuffle, QUALITY_KNEW, QUALITY_FORGOT, SKIP_DELAY
 
 import os
 from dotenv import load_dotenv
@@ -14,31 +34,138 @@ TOKEN = os.getenv('TELEGRAM_TOKEN')
 if not TOKEN:
     raise ValueError("TELEGRAM_TOKEN не знайдено! Перевір файл .env")
 
-# Ініціалізуємо менеджер бази даних
-db = DatabaseManager()
-
-# Зберігання даних для користувачів (тимчасове, під час роботи)
-user_data = {}
-
-
-def init_user_data(user_id):
-    """Ініціалізація даних користувача"""
-    if user_id not in user_data:
-        # Спробуємо отримати дані з БД
-        saved_data = db.get_user_data(user_id)
-
-        if saved_data:
-            # Якщо є дані в БД, використовуємо їх
-            user_data[user_id] = saved_data
-        else:
-            # Якщо даних немає, створюємо нові
-            user_data[user_id] = {
-                'words': [],  # [(eng, ukr), ...]
-                'current_index': 0,
-                'show_translation': False  # Додаємо флаг для показу перекладу
-            }
-            # Зберігаємо початкові дані в БД
-            db.save_user_data(user_id, user_data[user_id])
+# Адреса Bot API (наприклад, локальний сервер Bot API або тестовий для навантажувальних тестів)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
+# Шлях до файлу бази даних
+DB_PATH = os.getenv('DB_PATH', 'words_bot.db')
+# Кількість файлів БД, між якими розподіляються користувачі (words_bot.0.db, ...); 1 - один файл DB_PATH
+DB_SHARDS = int(os.getenv('DB_SHARDS', '1'))
+
+# Максимальне вікно втрати даних (секунди) для відкладеного запису позицій; 0 - писати одразу
+DB_FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL', '5'))
+# Кількість змінених користувачів, після якої запис відбувається позачергово
+DB_FLUSH_THRESHOLD = int(os.getenv('DB_FLUSH_THRESHOLD', '100'))
+# Обмеження кешу користувачів у пам'яті: кількість, приблизний розмір у байтах (0 - без обмеження)
+# і час неактивності в секундах, після якого користувач витісняється
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+USER_CACHE_MAX_BYTES = int(os.getenv('USER_CACHE_MAX_BYTES', '0'))
+USER_CACHE_IDLE_TTL = float(os.getenv('USER_CACHE_IDLE_TTL', '3600'))
+# Кількість готових сторінок списку слів у кеші
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', '2000'))
+
+# Скільки оновлень обробляти одночасно (оновлення одного користувача - завжди по черзі); 1 - послідовно
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '32'))
+
+# Обмеження вихідних запитів: повідомлень за секунду в один чат (0 - без обмеження), запас
+# для коротких серій і загальна кількість повідомлень за секунду
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+
+# Метрики у форматі Prometheus: адреса і порт HTTP-сервера (0 - вимкнено), поріг (секунди)
+# для запису повільних обробників у лог (0 - не записувати) і вікно активності користувача
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+SLOW_HANDLER_THRESHOLD = float(os.getenv('SLOW_HANDLER_THRESHOLD', '0'))
+ACTIVE_USER_WINDOW = 300
+
+# Режим роботи: "polling" (за замовчуванням) або "webhook"
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError(f"Невідомий BOT_MODE: {BOT_MODE} (очікується polling або webhook)")
+# Вебхук: публічна адреса, яку бот реєструє в Telegram (порожня - вебхук уже зареєстровано
+# іншим способом), секрет для заголовка X-Telegram-Bot-Api-Secret-Token, локальна адреса
+# і порт HTTP-сервера та шлях, на який Telegram надсилає оновлення (за замовчуванням - шлях з WEBHOOK_URL)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', urlsplit(WEBHOOK_URL).path or '/webhook')
+# Шлях для перевірки стану (балансувальник навантаження)
+HEALTH_PATH = os.getenv('HEALTH_PATH', '/healthz')
+
+# Імпорт з файлів: максимальний розмір (ліміт Bot API на завантаження), розмір пакета слів
+# на одну транзакцію і як часто (секунди) оновлювати повідомлення про прогрес
+MAX_IMPORT_FILE_SIZE = 20 * 1024 * 1024
+IMPORT_BATCH_SIZE = 1000
+IMPORT_PROGRESS_INTERVAL = 3
+# Експорт: скільки слів читати з БД за один запит
+EXPORT_CHUNK_SIZE = 1000
+
+# Адміністратори бота (ідентифікатори користувачів Telegram через кому) і каталог резервних копій БД
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+# За скільки останніх днів (разом із сьогоднішнім) показувати статистику
+STATS_DAYS = 7
+
+# Ініціалізуємо менеджер бази даних (запити виконуються поза циклом подій)
+if DB_SHARDS > 1:
+    DB_SHARD_PATHS = shard_paths(DB_PATH, DB_SHARDS)
+    existing_shards = [path for path in DB_SHARD_PATHS if os.path.exists(path)]
+    if os.path.exists(DB_PATH) and not existing_shards:
+        raise ValueError(
+            f"Знайдено {DB_PATH}, але немає файлів шардів: спочатку розбий БД "
+            f"командою python reshard.py --shards {DB_SHARDS}"
+        )
+    # Відсутній шард створився б порожнім, і дані його користувачів зникли б
+    if existing_shards and len(existing_shards) != DB_SHARDS:
+        missing_shards = sorted(set(DB_SHARD_PATHS).difference(existing_shards))
+        raise ValueError(f"Бракує файлів шардів: {', '.join(missing_shards)}")
+    # Зайвий файл означає, що БД розбита на більше шардів, ніж DB_SHARDS
+    extra_shard = shard_paths(DB_PATH, DB_SHARDS + 1)[-1]
+    if os.path.exists(extra_shard):
+        raise ValueError(f"Знайдено {extra_shard}: БД розбита на більше шардів, ніж DB_SHARDS={DB_SHARDS}")
+    db = AsyncDatabaseManager(ShardedDatabaseManager(DB_SHARD_PATHS))
+else:
+    db = AsyncDatabaseManager(DatabaseManager(DB_PATH))
+
+# Зберігання даних для користувачів (кеш активних користувачів, під час роботи)
+user_data = UserStore(
+    db,
+    flush_interval=DB_FLUSH_INTERVAL,
+    flush_threshold=DB_FLUSH_THRESHOLD,
+    max_entries=USER_CACHE_MAX_ENTRIES,
+    max_bytes=USER_CACHE_MAX_BYTES,
+    idle_ttl=USER_CACHE_IDLE_TTL
+)
+
+# Кеш готових сторінок списку слів (ключ: користувач, версія списку, сторінка, вигляд)
+render_cache = RenderCache(RENDER_CACHE_MAX_ENTRIES)
+
+
+# Черга вихідних запитів з обмеженням частоти (редагування одного повідомлення зливаються)
+flood_control = None
+if OUTBOUND_CHAT_RATE > 0:
+    flood_control = FloodControlLimiter(OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_GLOBAL_RATE)
+
+metrics.slow_handler_threshold = SLOW_HANDLER_THRESHOLD
+Gauge('bot_users_cached', "Користувачі в кеші", lambda: len(user_data))
+Gauge('bot_users_active', f"Користувачі, активні за {ACTIVE_USER_WINDOW} с", lambda: user_data.active_count(ACTIVE_USER_WINDOW))
+Gauge('bot_user_cache_bytes', "Приблизний розмір кешу користувачів", lambda: user_data.stats()['bytes'])
+Gauge('bot_user_cache_dirty', "Користувачі з незбереженими змінами", lambda: user_data.stats()['dirty'])
+Gauge('bot_vocabulary_entries', "Пари слів у спільному словнику в пам'яті", lambda: len(user_data.vocabulary))
+Gauge('bot_user_cache_hits_total', "Влучання в кеш користувачів", lambda: user_data.hits, kind='counter')
+Gauge('bot_user_cache_misses_total', "Промахи кешу користувачів", lambda: user_data.misses, kind='counter')
+Gauge('bot_user_cache_evictions_total', "Витіснення з кешу користувачів", lambda: user_data.evictions, kind='counter')
+Gauge('bot_render_cache_hits_total', "Влучання в кеш сторінок", lambda: render_cache.hits, kind='counter')
+Gauge('bot_render_cache_misses_total', "Промахи кешу сторінок", lambda: render_cache.misses, kind='counter')
+if flood_control is not None:
+    Gauge('bot_outbound_waiting', "Вихідні запити, що чекають на свою чергу", lambda: flood_control.stats()['waiting'])
+    Gauge('bot_outbound_pending_edits', "Відкладені редагування повідомлень", lambda: flood_control.stats()['pending_edits'])
+    Gauge('bot_outbound_sent_total', "Відправлені вихідні запити", lambda: flood_control.sent, kind='counter')
+    Gauge('bot_outbound_coalesced_total', "Редагування, замінені новішими до відправки", lambda: flood_control.coalesced, kind='counter')
+    Gauge('bot_outbound_retries_total', "Повтори після 429 від Telegram", lambda: flood_control.retries, kind='counter')
+
+# HTTP-сервер метрик (запускається в post_init, якщо задано METRICS_PORT)
+metrics_server = None
+# Чи виконується зараз резервне копіювання (одночасно - лише одне)
+backup_running = False
+
+
+async def init_user_data(user_id):
+    """Ініціалізація даних користувача (з кешу або з БД)"""
+    return await user_data.get(user_id)
 
 
 def escape_markdown_v2(text):
@@ -49,85 +176,179 @@ def escape_markdown_v2(text):
     return text
 
 
-def parse_word_list(text):
-    """Парсинг списку слів з різними роздільниками"""
-    lines = text.strip().split('\n')
-    words = []
+# Можливі роздільники (у порядку пріоритету)
+SEPARATORS = [' - ', ' – ', ' — ', ' | ', ' : ', ' ; ', '\t']
+FIRST_SEPARATOR = SEPARATORS[0]
+OTHER_SEPARATORS = SEPARATORS[1:]
 
-    # Можливі роздільники
-    separators = [' - ', ' – ', ' — ', ' | ', ' : ', ' ; ', '\t']
+
+def iter_word_list(lines, text=None):
+    """Потоковий парсинг рядків (генератор), не тримає весь текст у пам'яті
+
+    Найчастіший роздільник перевіряється першим. Якщо переданий весь текст,
+    решта рядків перевіряється лише на ті роздільники, що в ньому трапляються
+    (визначаються один раз, при першій потребі).
+    """
+    others = OTHER_SEPARATORS if text is None else None
 
     for line in lines:
         line = line.strip()
         if not line:
             continue
 
-        # Пробуємо різні роздільники
-        for sep in separators:
+        # Усі роздільники починаються і закінчуються пробільним символом, а рядок
+        # уже обрізано, тож обидві частини навколо роздільника непорожні
+        if FIRST_SEPARATOR in line:
+            eng, _, ukr = line.partition(FIRST_SEPARATOR)
+            yield eng.strip(), ukr.strip()
+            continue
+
+        if others is None:
+            others = [sep for sep in OTHER_SEPARATORS if sep in text]
+
+        # Пробуємо інші роздільники
+        for sep in others:
             if sep in line:
-                parts = line.split(sep, 1)
-                if len(parts) == 2:
-                    eng = parts[0].strip()
-                    ukr = parts[1].strip()
-                    if eng and ukr:
-                        words.append((eng, ukr))
-                    break
+                eng, _, ukr = line.partition(sep)
+                yield eng.strip(), ukr.strip()
+                break
         else:
-            # Якщо не знайдено роздільник, спробуємо пробіл
-            parts = line.split()
-            if len(parts) >= 2:
-                # Перша частина - англійське слово, решта - переклад
-                eng = parts[0]
-                ukr = ' '.join(parts[1:])
-                words.append((eng, ukr))
+            # Якщо не знайдено роздільник, спробуємо пробіл:
+            # перша частина - англійське слово, решта - переклад
+            parts = line.split(None, 1)
+            if len(parts) == 2:
+                yield parts[0], ' '.join(parts[1].split())
 
-    return words
+
+def iter_csv_word_list(lines):
+    """Потоковий парсинг CSV: перша колонка - слово, друга - переклад"""
+    for row in csv.reader(lines):
+        if len(row) >= 2:
+            eng = row[0].strip()
+            ukr = row[1].strip()
+            if eng and ukr:
+                yield eng, ukr
+
+
+def iter_tsv_word_list(lines):
+    """Потоковий парсинг TSV: слово і переклад розділені табуляцією (інші роздільники не шукаються)"""
+    for line in lines:
+        eng, _, ukr = line.rstrip('\r\n').partition('\t')
+        eng = eng.strip()
+        ukr = ukr.strip()
+        if eng and ukr:
+            yield eng, ukr
+
+
+def parse_word_list(text):
+    """Парсинг списку слів з різними роздільниками"""
+    return list(iter_word_list(text.strip().split('\n'), text))
+
+
+# Статичні клавіатури створюються один раз (InlineKeyboardMarkup незмінний)
+MAIN_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Додати слова", callback_data="add_words")],
+    [InlineKeyboardButton("📚 Наступне слово", callback_data="next_word")],
+    [InlineKeyboardButton("📊 Статистика", callback_data="stats")],
+    [InlineKeyboardButton("🔀 Випадковий порядок / по черзі", callback_data="shuffle")],
+    [InlineKeyboardButton("🗑️ Керування словами", callback_data="manage_words")]
+])
+
+MANAGE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🗑️ Видалити всі слова", callback_data="delete_all")],
+    [InlineKeyboardButton("❌ Видалити конкретне слово", callback_data="delete_specific")],
+    [InlineKeyboardButton("📝 Показати всі слова", callback_data="show_all")],
+    [InlineKeyboardButton("🔍 Знайти слово", callback_data="find")],
+    [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")]
+])
+
+ADD_WORDS_KEYBOARDS = {
+    False: InlineKeyboardMarkup([
+        [InlineKeyboardButton("⏭️ Дублікати: пропускати", callback_data="toggle_duplicates")],
+        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_main")]
+    ]),
+    True: InlineKeyboardMarkup([
+        [InlineKeyboardButton("♻️ Дублікати: оновлювати переклад", callback_data="toggle_duplicates")],
+        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_main")]
+    ]),
+}
+
+CONFIRM_DELETE_ALL_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Так, видалити всі", callback_data="confirm_delete_all")],
+    [InlineKeyboardButton("❌ Ні, залишити", callback_data="manage_words")]
+])
+
+# Кнопка повернення до меню управління (спільна для сторінок зі словами)
+BACK_TO_MANAGE_BUTTON = InlineKeyboardButton("↩️ До меню керування", callback_data="manage_words")
 
 
 def get_main_keyboard():
-    """Створення основної клавіатури"""
-    keyboard = [
-        [InlineKeyboardButton("➕ Додати слова", callback_data="add_words")],
-        [InlineKeyboardButton("📚 Наступне слово", callback_data="next_word")],
-        [InlineKeyboardButton("📊 Статистика", callback_data="stats")],
-        [InlineKeyboardButton("🗑️ Керування словами", callback_data="manage_words")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Основна клавіатура"""
+    return MAIN_KEYBOARD
 
 
 def get_manage_keyboard():
     """Клавіатура для керування словами"""
-    keyboard = [
-        [InlineKeyboardButton("🗑️ Видалити всі слова", callback_data="delete_all")],
-        [InlineKeyboardButton("❌ Видалити конкретне слово", callback_data="delete_specific")],
-        [InlineKeyboardButton("📝 Показати всі слова", callback_data="show_all")],
-        [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_main")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return MANAGE_KEYBOARD
+
+
+def get_add_words_keyboard(update_duplicates=False):
+    """Клавіатура вибору, що робити з дублікатами при додаванні слів"""
+    return ADD_WORDS_KEYBOARDS[update_duplicates]
 
 
-def get_word_keyboard(show_translation=False):
-    """Створення клавіатури для роботи зі словом"""
+def get_word_keyboard(word_id, show_translation=False):
+    """Клавіатура для роботи зі словом
+
+    Ідентифікатор слова передається в кнопках: поточне слово зберігається лише
+    в пам'яті і втрачається після витіснення з кешу або перезапуску бота.
+    """
+    keyboard = []
     if not show_translation:
         # Якщо переклад ще не показано
-        keyboard = [
-            [InlineKeyboardButton("👁️ Побачити переклад", callback_data="show_translation")],
-            [InlineKeyboardButton("➡️ Наступне слово", callback_data="next_word")],
-            [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_main")]
-        ]
-    else:
-        # Якщо переклад уже показано
-        keyboard = [
-            [InlineKeyboardButton("➡️ Наступне слово", callback_data="next_word")],
-            [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_main")]
-        ]
+        keyboard.append([InlineKeyboardButton("👁️ Побачити переклад", callback_data=callback_data("show_translation", word_id))])
+    keyboard += [
+        [InlineKeyboardButton("✅ Знаю", callback_data=callback_data("knew_word", word_id)),
+         InlineKeyboardButton("❌ Не знаю", callback_data=callback_data("forgot_word", word_id))],
+        [InlineKeyboardButton("➡️ Наступне слово", callback_data="next_word")],
+        [InlineKeyboardButton("🏠 Головне меню", callback_data="back_to_main")]
+    ]
     return InlineKeyboardMarkup(keyboard)
 
 
+def page_anchor(raw):
+    """Аргумент кнопки сторінки "<id першого слова>.<позиція>" -> (id, позиція)
+
+    Позиція потрібна лише для номера сторінки, тож після видалень вона може
+    трохи відставати - слова сторінки все одно визначаються ідентифікатором.
+    """
+    first_word_id, _, start = raw.partition('.')
+    return int(first_word_id), int(start or 0)
+
+
+def get_page_navigation(page, start_idx, page_size, route):
+    """Рядок кнопок «Назад» / «Вперед»; сторінки задаються ідентифікатором свого першого слова"""
+    nav_buttons = []
+
+    # Кнопка «Назад» на попередню сторінку
+    if page['prev_id'] is not None:
+        prev_start = max(0, start_idx - page_size) if page['prev_id'] else 0
+        anchor = f"{page['prev_id']}.{prev_start}"
+        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=callback_data(route, anchor)))
+
+    # Кнопка «Вперед» на наступну сторінку
+    if page['next_id'] is not None:
+        anchor = f"{page['next_id']}.{start_idx + len(page['words'])}"
+        nav_buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=callback_data(route, anchor)))
+
+    return nav_buttons
+
+
+@timed_handler('start')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /start"""
     user_id = update.effective_user.id
-    init_user_data(user_id)
+    await init_user_data(user_id)
 
     welcome_text = """🎓 Привіт! Це бот для вивчення слів.
 
@@ -140,6 +361,9 @@ book - книга
 • Додавання нових слів
 • Перегляд слів для вивчення
 • Керування списком слів
+• Пошук слів: /find слово
+• Експорт слів у файл: /export (або /export tsv)
+• Випадковий порядок слів без повторів
 • Статистика навчання
 
 Натисни кнопку щоб почати! 👇"""
@@ -147,179 +371,379 @@ book - книга
     await update.message.reply_text(welcome_text, reply_markup=get_main_keyboard())
 
 
+def callback_name(update):
+    """Тип кнопки для метрик: назва маршруту без аргументу"""
+    name = update.callback_query.data.partition(CallbackRouter.SEPARATOR)[0]
+    return name if name in router else 'unknown'
+
+
+@timed_handler(callback_name)
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обробник натискань кнопок"""
     query = update.callback_query
     await query.answer()
 
     user_id = query.from_user.id
-    init_user_data(user_id)
 
-    data = query.data
-
-    if data == "add_words":
+    resolved = router.resolve(query.data)
+    if resolved is None:
+        # Кнопка зі старого формату або невідома - показуємо головне меню
         await query.edit_message_text(
-            "📝 Надішли мені список слів у одному з форматів:\n\n"
-            "word - переклад\n"
-            "word | переклад\n"
-            "word : переклад\n"
-            "word переклад\n\n"
-            "Кожне слово з нового рядка."
+            "⚠️ Ця кнопка застаріла. 🏠 Головне меню:",
+            reply_markup=get_main_keyboard()
         )
-        context.user_data['waiting_for_words'] = True
+        return
 
-    elif data == "next_word":
-        await show_next_word(query, user_id)
+    handler, args, load_user = resolved
+    user = await init_user_data(user_id) if load_user else None
+    await handler(query, context, user_id, user, *args)
 
-    elif data == "show_translation":
-        await show_translation(query, user_id)
 
-    elif data == "stats":
-        await show_stats(query, user_id)
+# Обробники кнопок: кожен отримує (query, context, user_id, user, *аргументи з callback_data),
+# де user - дані користувача, завантажені один раз на оновлення (після очікувань їх не
+# треба шукати в кеші знову). Для маршрутів з load_user=False дані не завантажуються, user - None
+router = CallbackRouter()
 
-    elif data == "manage_words":
-        await query.edit_message_text(
-            "🗑️ Керування словами:",
-            reply_markup=get_manage_keyboard()
-        )
 
-    elif data == "delete_all":
-        await confirm_delete_all(query, user_id)
+@router.route("add_words")
+async def on_add_words(query, context, user_id, user):
+    await show_add_words(query, context)
+    context.user_data['waiting_for_words'] = True
+    context.user_data['waiting_for_search'] = False
 
-    elif data == "confirm_delete_all":
-        user_data[user_id]['words'] = []
-        user_data[user_id]['current_index'] = 0
-        user_data[user_id]['show_translation'] = False
 
-        # Зберігаємо оновлені дані в БД
-        db.save_user_data(user_id, user_data[user_id])
+@router.route("toggle_duplicates")
+async def on_toggle_duplicates(query, context, user_id, user):
+    context.user_data['update_duplicates'] = not context.user_data.get('update_duplicates', False)
+    await show_add_words(query, context)
+    context.user_data['waiting_for_words'] = True
 
-        await query.edit_message_text(
-            "✅ Всі слова видалено!",
-            reply_markup=get_main_keyboard()
-        )
 
-    elif data == "delete_specific":
-        await show_words_for_deletion(query, user_id, 0)
+@router.route("next_word")
+async def on_next_word(query, context, user_id, user):
+    await show_next_word(query, user_id, user)
 
-    elif data.startswith("delete_page_"):
-        page = int(data.replace("delete_page_", ""))
-        await show_words_for_deletion(query, user_id, page)
 
-    elif data == "show_all":
-        await show_all_words(query, user_id, 0)
+@router.route("show_translation", int)
+async def on_show_translation(query, context, user_id, user, word_id):
+    await show_translation(query, user_id, user, word_id)
 
-    elif data.startswith("words_page_"):
-        page = int(data.replace("words_page_", ""))
-        await show_all_words(query, user_id, page)
 
-    elif data.startswith("delete_word_"):
-        word_index = int(data.replace("delete_word_", ""))
-        await delete_specific_word(query, user_id, word_index)
+@router.route("knew_word", int)
+async def on_knew_word(query, context, user_id, user, word_id):
+    await grade_word(query, user_id, user, word_id, QUALITY_KNEW)
+
+
+@router.route("forgot_word", int)
+async def on_forgot_word(query, context, user_id, user, word_id):
+    await grade_word(query, user_id, user, word_id, QUALITY_FORGOT)
+
+
+@router.route("stats")
+async def on_stats(query, context, user_id, user):
+    await show_stats(query, user_id, user)
 
-    elif data == "back_to_main":
-        await query.edit_message_text(
-            "🏠 Головне меню:",
-            reply_markup=get_main_keyboard()
-        )
 
+@router.route("shuffle")
+async def on_shuffle(query, context, user_id, user):
+    await toggle_shuffle(query, user_id, user)
 
-async def show_next_word(query, user_id):
-    """Показати наступне слово (спочатку без перекладу)"""
-    words = user_data[user_id]['words']
 
-    if not words:
+@router.route("manage_words")
+async def on_manage_words(query, context, user_id, user):
+    await query.edit_message_text(
+        "🗑️ Керування словами:",
+        reply_markup=get_manage_keyboard()
+    )
+
+
+@router.route("delete_all")
+async def on_delete_all(query, context, user_id, user):
+    await confirm_delete_all(query, user)
+
+
+@router.route("confirm_delete_all")
+async def on_confirm_delete_all(query, context, user_id, user):
+    removed = list(user['deck'].vocab_ids)
+    user['deck'].clear()
+    user['current_index'] = 0
+    if user['shuffle'] is not None:
+        user['shuffle'] = Shuffle()
+    user['current_word_id'] = None
+    user['show_translation'] = False
+    user_data.words_changed(user_id, user, removed=removed)
+
+    # Видаляємо слова з БД
+    await db.delete_all_words(user_id)
+
+    await query.edit_message_text(
+        "✅ Всі слова видалено!",
+        reply_markup=get_main_keyboard()
+    )
+
+
+@router.route("delete_specific", load_user=False)
+async def on_delete_specific(query, context, user_id, user):
+    await show_words_for_deletion(query, user_id)
+
+
+@router.route("delete_page", page_anchor, load_user=False)
+async def on_delete_page(query, context, user_id, user, anchor):
+    await show_words_for_deletion(query, user_id, anchor)
+
+
+@router.route("show_all", load_user=False)
+async def on_show_all(query, context, user_id, user):
+    await show_all_words(query, user_id)
+
+
+@router.route("words_page", page_anchor, load_user=False)
+async def on_words_page(query, context, user_id, user, anchor):
+    await show_all_words(query, user_id, anchor)
+
+
+@router.route("find", load_user=False)
+async def on_find(query, context, user_id, user):
+    await query.edit_message_text(FIND_PROMPT, reply_markup=FIND_PROMPT_KEYBOARD)
+    context.user_data['waiting_for_search'] = True
+    context.user_data['waiting_for_words'] = False
+
+
+@router.route("find_page", int, load_user=False)
+async def on_find_page(query, context, user_id, user, after_id):
+    text = context.user_data.get('find_query')
+    if not text:
+        await query.edit_message_text(FIND_PROMPT, reply_markup=FIND_PROMPT_KEYBOARD)
+        context.user_data['waiting_for_search'] = True
+        return
+    page_text, keyboard = await render_search_page(user_id, text, after_id)
+    await query.edit_message_text(page_text, reply_markup=keyboard)
+
+
+@router.route("delete_word", int)
+async def on_delete_word(query, context, user_id, user, word_id):
+    await delete_specific_word(query, user_id, user, word_id)
+
+
+@router.route("back_to_main")
+async def on_back_to_main(query, context, user_id, user):
+    await query.edit_message_text(
+        "🏠 Головне меню:",
+        reply_markup=get_main_keyboard()
+    )
+
+
+async def show_add_words(query, context):
+    """Запрошення надіслати список слів"""
+    await query.edit_message_text(
+        "📝 Надішли мені список слів у одному з форматів:\n\n"
+        "word - переклад\n"
+        "word | переклад\n"
+        "word : переклад\n"
+        "word переклад\n\n"
+        "Кожне слово з нового рядка.\n"
+        "Великий список можна надіслати файлом .txt, .csv або .tsv.",
+        reply_markup=get_add_words_keyboard(context.user_data.get('update_duplicates', False))
+    )
+
+
+async def show_next_word(query, user_id, user, last=None):
+    """Показати наступне слово (спочатку без перекладу)
+
+    last - щойно оцінене слово: відкладати його не треба (оцінка вже
+    запланувала повторення), але й показувати одразу знову не можна.
+    """
+    deck = user['deck']
+
+    if not deck:
         await query.edit_message_text(
             "📭 У тебе ще немає слів! Додай їх спочатку.",
             reply_markup=get_main_keyboard()
         )
         return
 
-    # Отримуємо індекс поточного слова
-    current_idx = user_data[user_id]['current_index']
+    now = time.time()
+    queue = user['queue']
 
-    word, translation = words[current_idx]
+    # Слово, пропущене без оцінки, відкладаємо, щоб воно не повторилось одразу
+    shown_id = user['current_word_id']
+    shown_due = deck.get_due(shown_id)
+    if shown_due is not None and shown_due <= now:
+        queue.schedule(shown_id, int(now + SKIP_DELAY))
+    if last is None:
+        last = shown_id
 
-    # Переходимо до наступного слова
-    user_data[user_id]['current_index'] = (user_data[user_id]['current_index'] + 1) % len(words)
+    # Спочатку слова, які пора повторити (O(log n) через купу)
+    word_id = queue.peek_due(now)
 
-    # Скидаємо флаг показу перекладу для нового слова
-    user_data[user_id]['show_translation'] = False
+    shuffle = user['shuffle']
+    if word_id is None and shuffle is not None:
+        # Випадковий порядок: у черзі лише оцінені слова, а решту дає
+        # перестановка, що обчислюється для кожної позиції, без списку
+        word_id = shuffle.next(deck, last=last)
 
-    # Зберігаємо оновлені дані користувача в БД
-    db.save_user_data(user_id, user_data[user_id])
+        # Стан кола буде записано в БД разом з іншими змінами (відкладений запис)
+        await user_data.mark_dirty(user_id, user)
+    elif word_id is None:
+        # Якщо повторювати нічого, йдемо по списку по колу
+        current_idx = user['current_index']
+        word_id = deck.word_ids[current_idx]
+
+        # Переходимо до наступного слова
+        user['current_index'] = (user['current_index'] + 1) % len(deck)
+
+        # Позицію буде записано в БД разом з іншими змінами (відкладений запис)
+        await user_data.mark_dirty(user_id, user)
+
+    word, translation = user_data.vocabulary[deck.vocab_id(word_id)]
+    user['current_word_id'] = word_id
+
+    # Скидаємо флаг показу перекладу для нового слова
+    user['show_translation'] = False
 
     # Формуємо повідомлення - показуємо тільки англійське слово
     text = f"🔤 *{word}*\n\n💭 Спробуй згадати переклад!"
-    await query.edit_message_text(text, reply_markup=get_word_keyboard(False), parse_mode="Markdown")
+    await query.edit_message_text(text, reply_markup=get_word_keyboard(word_id, False), parse_mode="Markdown")
 
 
-async def show_translation(query, user_id):
-    """Показати переклад поточного слова"""
-    words = user_data[user_id]['words']
+async def word_missing(query):
+    """Відповідь на кнопку слова, якого вже немає у списку"""
+    await query.edit_message_text(
+        "❌ Цього слова вже немає у списку!",
+        reply_markup=get_main_keyboard()
+    )
 
-    if not words:
-        await query.edit_message_text(
-            "📭 У тебе ще немає слів! Додай їх спочатку.",
-            reply_markup=get_main_keyboard()
-        )
-        return
 
-    # Отримуємо попередній індекс (оскільки в show_next_word ми вже перейшли до наступного)
-    prev_idx = (user_data[user_id]['current_index'] - 1) % len(words)
-    word, translation = words[prev_idx]
+async def show_translation(query, user_id, user, word_id):
+    """Показати переклад слова з кнопки"""
+    deck = user['deck']
+    word_index = deck.index(word_id)
+    if word_index is None:
+        await word_missing(query)
+        return
+    word, translation = user_data.vocabulary[deck.vocab_ids[word_index]]
 
-    # Встановлюємо флаг що переклад показано
-    user_data[user_id]['show_translation'] = True
+    # Після витіснення з кешу поточне слово в пам'яті втрачено - відновлюємо з кнопки
+    if user['current_word_id'] != word_id:
+        user['current_word_id'] = word_id
+        user['show_translation'] = False
 
-    # Зберігаємо оновлені дані користувача в БД
-    db.save_user_data(user_id, user_data[user_id])
+    # Встановлюємо флаг що переклад показано (в БД не зберігається)
+    if not user['show_translation']:
+        user['show_translation'] = True
+        # Кількість показів потрапить у денну статистику разом із позицією
+        user['reveals'] += 1
+        await user_data.mark_dirty(user_id, user)
 
     # Формуємо повідомлення з перекладом
     text = f"🔤 *{word}*\n\n✅ Переклад: *{translation}*"
-    await query.edit_message_text(text, reply_markup=get_word_keyboard(True), parse_mode="Markdown")
+    await query.edit_message_text(text, reply_markup=get_word_keyboard(word_id, True), parse_mode="Markdown")
+
+
+async def grade_word(query, user_id, user, word_id, quality):
+    """Оцінка відповіді на слово з кнопки і перехід до наступного"""
+    card = user['deck'].card(word_id)
+    if card is None:
+        await word_missing(query)
+        return
+
+    # Плануємо наступне повторення і зберігаємо лише це слово
+    review(card, quality, time.time())
+    user['deck'].store(word_id, card)
+    user['queue'].schedule(word_id, card.due_at)
+    user['current_word_id'] = None
+    await db.save_review(user_id, word_id, card)
+
+    await show_next_word(query, user_id, user, last=word_id)
+
+
+def summarize_days(daily):
+    """Суми денної статистики за сьогодні і за STATS_DAYS днів"""
+    current_day = today()
+    week = {'words_added': 0, 'reviews': 0, 'reveals': 0}
+    for stats in daily.values():
+        for name, value in stats.items():
+            week[name] += value
+    return dict(daily.get(current_day, dict.fromkeys(week, 0))), week
+
+
+def format_activity(day, week):
+    return (
+        f"➕ Додано слів: {day['words_added']} сьогодні, {week['words_added']} за {STATS_DAYS} дн.\n"
+        f"🔁 Повторено: {day['reviews']} сьогодні, {week['reviews']} за {STATS_DAYS} дн.\n"
+        f"👀 Показано перекладів: {day['reveals']} сьогодні, {week['reveals']} за {STATS_DAYS} дн."
+    )
 
 
-async def show_stats(query, user_id):
+async def show_stats(query, user_id, user):
     """Показати статистику"""
-    words = user_data[user_id]['words']
-    total_words = len(words)
+    total_words = len(user['deck'])
+    current_index = user['current_index']
+    due_words = await db.count_due_words(user_id, int(time.time()))
+    day, week = summarize_days(await db.get_daily_stats(user_id, today() - STATS_DAYS + 1))
+    if user['shuffle'] is not None:
+        current_position = "🔀 Випадковий порядок"
+    elif total_words > 0:
+        current_position = f"▶️ Поточне слово: {current_index + 1}/{total_words}"
+    else:
+        current_position = ""
+    # Покази перекладів, ще не записані в БД (відкладений запис)
+    day['reveals'] += user['reveals']
+    week['reveals'] += user['reveals']
 
     stats_text = f"""📊 *Статистика:*
 
 📚 Всього слів: {total_words}
+🔁 Пора повторити: {due_words}
+
+{format_activity(day, week)}
 
-{f"▶️ Поточне слово: {user_data[user_id]['current_index'] + 1}/{total_words}" if total_words > 0 else ""}"""
+{current_position}"""
 
     await query.edit_message_text(stats_text, reply_markup=get_main_keyboard(), parse_mode="Markdown")
 
 
-async def confirm_delete_all(query, user_id):
-    """Підтвердження видалення всіх слів"""
-    keyboard = [
-        [InlineKeyboardButton("✅ Так, видалити всі", callback_data="confirm_delete_all")],
-        [InlineKeyboardButton("❌ Ні, залишити", callback_data="manage_words")]
-    ]
+async def toggle_shuffle(query, user_id, user):
+    """Перемикання між випадковим порядком слів і порядком по черзі"""
+    deck = user['deck']
+    if user['shuffle'] is None:
+        user['shuffle'] = Shuffle()
+        text = "🔀 Тепер слова йтимуть у випадковому порядку, без повторів, поки не покажу всі.\n"
+        text += "Слова, які пора повторити, як і раніше, йдуть першими."
+    else:
+        user['shuffle'] = None
+        text = "➡️ Тепер слова йтимуть по черзі."
+    # У випадковому порядку черга тримає лише оцінені слова
+    user['queue'] = ReviewQueue(deck, graded_only=user['shuffle'] is not None)
+    await user_data.mark_dirty(user_id, user)
+
+    await query.edit_message_text(text, reply_markup=get_main_keyboard())
 
+
+async def confirm_delete_all(query, user):
+    """Підтвердження видалення всіх слів"""
     await query.edit_message_text(
-        f"⚠️ Ти впевнений що хочеш видалити всі {len(user_data[user_id]['words'])} слів?",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        f"⚠️ Ти впевнений що хочеш видалити всі {len(user['deck'])} слів?",
+        reply_markup=CONFIRM_DELETE_ALL_KEYBOARD
     )
 
 
-async def delete_specific_word(query, user_id, word_index):
-    """Видалити конкретне слово"""
-    words = user_data[user_id]['words']
+async def delete_specific_word(query, user_id, user, word_id):
+    """Видалити конкретне слово за його ідентифікатором"""
+    deck = user['deck']
+    vocab_id = deck.remove(word_id)
 
-    if 0 <= word_index < len(words):
-        deleted_word = words.pop(word_index)
+    if vocab_id is not None:
+        deleted_word = user_data.vocabulary[vocab_id]
 
         # Оновлюємо індекси після видалення
-        if user_data[user_id]['current_index'] >= len(words) and words:
-            user_data[user_id]['current_index'] = 0
+        if user['current_index'] >= len(deck) and deck:
+            user['current_index'] = 0
 
-        # Зберігаємо оновлені дані в БД
-        db.save_user_data(user_id, user_data[user_id])
+        user_data.words_changed(user_id, user, removed=[vocab_id])
+
+        # Видаляємо з БД лише це слово
+        await db.delete_word(user_id, word_id, user['current_index'])
 
         await query.edit_message_text(
             f"✅ Слово '{deleted_word[0]} - {deleted_word[1]}' видалено!",
@@ -327,139 +751,330 @@ async def delete_specific_word(query, user_id, word_index):
         )
     else:
         await query.edit_message_text(
-            "❌ Помилка при видаленні слова!",
+            "❌ Цього слова вже немає у списку!",
             reply_markup=get_manage_keyboard()
         )
 
 
-async def show_words_for_deletion(query, user_id, page=0):
-    """Показати слова для видалення з пагінацією"""
-    words = user_data[user_id]['words']
+# Кількість слів на сторінці
+DELETION_PAGE_SIZE = 10
+WORDS_PAGE_SIZE = 20
 
-    if not words:
-        await query.edit_message_text(
-            "📭 У тебе немає слів для видалення!",
-            reply_markup=get_manage_keyboard()
-        )
-        return
 
-    # Кількість слів на сторінці
-    page_size = 10
-    total_pages = (len(words) + page_size - 1) // page_size
+def page_start(page, start_hint):
+    """Позиція першого слова сторінки: з БД, якщо відома, інакше з кнопки (в межах списку)"""
+    if page['start'] is not None:
+        return page['start']
+    last_start = page['total'] - len(page['words'])
+    if page['next_id'] is None:
+        return last_start
+    return max(0, min(start_hint, last_start))
+
 
-    # Визначаємо діапазон слів для поточної сторінки
-    start_idx = page * page_size
-    end_idx = min(start_idx + page_size, len(words))
+def render_deletion_page(page, start_hint=0):
+    """Текст і клавіатура сторінки вибору слова для видалення"""
+    page_size = DELETION_PAGE_SIZE
+    total_pages = (page['total'] + page_size - 1) // page_size
+    start_idx = page_start(page, start_hint)
+    end_idx = start_idx + len(page['words'])
 
     # Створюємо кнопки для слів на поточній сторінці
     keyboard = []
-    for i in range(start_idx, end_idx):
-        word, translation = words[i]
+    for word_id, (word, translation) in page['words']:
         # Обмежуємо довжину тексту кнопки для кращого відображення
         button_text = f"❌ {word} - {translation}"
         if len(button_text) > 30:
             button_text = f"❌ {word} - {translation[:20]}..."
 
+        # Кнопка містить ідентифікатор слова, а не позицію, тож не застаріває після видалень
         keyboard.append([InlineKeyboardButton(
             button_text,
-            callback_data=f"delete_word_{i}"
+            callback_data=callback_data("delete_word", word_id)
         )])
 
-    # Додаємо навігаційні кнопки
-    nav_buttons = []
+    # Додаємо навігаційні кнопки, якщо їх більше нуля
+    nav_buttons = get_page_navigation(page, start_idx, page_size, "delete_page")
+    if nav_buttons:
+        keyboard.append(nav_buttons)
 
-    # Кнопка «Назад» на попередню сторінку
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"delete_page_{page - 1}"))
+    keyboard.append([BACK_TO_MANAGE_BUTTON])
 
-    # Кнопка «Вперед» на наступну сторінку
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"delete_page_{page + 1}"))
+    # Формуємо текст повідомлення
+    text = (
+        f"🗑️ Вибери слово для видалення (сторінка {start_idx // page_size + 1}/{total_pages}):\n"
+        f"Показано слова {start_idx + 1}-{end_idx} з {page['total']}"
+    )
+    return text, InlineKeyboardMarkup(keyboard)
 
-    # Додаємо навігаційні кнопки, якщо їх більше нуля
+
+def render_words_page(page, start_hint=0):
+    """Текст і клавіатура сторінки зі списком слів"""
+    page_size = WORDS_PAGE_SIZE
+    total_pages = (page['total'] + page_size - 1) // page_size
+    start_idx = page_start(page, start_hint)
+    end_idx = start_idx + len(page['words'])
+
+    # Формуємо текст зі словами (одним join замість конкатенації в циклі)
+    lines = [
+        f"📚 *Твої слова ({page['total']}):*",
+        f"Сторінка {start_idx // page_size + 1}/{total_pages} (слова {start_idx + 1}-{end_idx})",
+        ""
+    ]
+    lines.extend(
+        f"{i}. {word} - {translation}"
+        for i, (_, (word, translation)) in enumerate(page['words'], start_idx + 1)
+    )
+    text = "\n".join(lines) + "\n"
+
+    # Створюємо кнопки навігації
+    keyboard = []
+    nav_buttons = get_page_navigation(page, start_idx, page_size, "words_page")
     if nav_buttons:
         keyboard.append(nav_buttons)
 
-    # Кнопка повернення до меню управління
-    keyboard.append([InlineKeyboardButton("↩️ До меню керування", callback_data="manage_words")])
+    keyboard.append([BACK_TO_MANAGE_BUTTON])
 
-    # Формуємо текст повідомлення
-    text = f"🗑️ Вибери слово для видалення (сторінка {page + 1}/{total_pages}):\n"
-    text += f"Показано слова {start_idx + 1}-{end_idx} з {len(words)}"
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def get_rendered_page(user_id, anchor, page_size, render, view):
+    """Готова сторінка списку слів: з кешу сторінок або з БД
+
+    Сторінка читається з БД, тож список слів користувача не треба тримати в
+    пам'яті. Кеш використовується, лише коли користувач і так є в пам'яті:
+    тільки тоді відома версія його списку. Повертає None, якщо слів немає.
+    """
+    first_word_id, start_hint = anchor
+    entry = user_data[user_id] if user_id in user_data else None
+    key = None
+    if entry is not None:
+        key = (user_id, entry['version'], anchor, view)
+        rendered = render_cache.get(key)
+        if rendered is not None:
+            return rendered
+
+    page = await db.get_words_page(user_id, first_word_id, page_size)
+    if not page or not page['total']:
+        return None
+
+    rendered = render(page, start_hint)
+    if key is not None and entry['version'] == key[1]:
+        render_cache.put(key, rendered)
+    return rendered
+
+
+async def show_words_for_deletion(query, user_id, anchor=(0, 0)):
+    """Показати слова для видалення з пагінацією"""
+    rendered = await get_rendered_page(user_id, anchor, DELETION_PAGE_SIZE, render_deletion_page, 'delete')
+
+    if rendered is None:
+        await query.edit_message_text(
+            "📭 У тебе немає слів для видалення!",
+            reply_markup=get_manage_keyboard()
+        )
+        return
 
-    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
+    text, keyboard = rendered
+    await query.edit_message_text(text, reply_markup=keyboard, parse_mode="Markdown")
 
 
-async def show_all_words(query, user_id, page=0):
+async def show_all_words(query, user_id, anchor=(0, 0)):
     """Показати всі слова з пагінацією"""
-    words = user_data[user_id]['words']
+    rendered = await get_rendered_page(user_id, anchor, WORDS_PAGE_SIZE, render_words_page, 'all')
 
-    if not words:
+    if rendered is None:
         await query.edit_message_text(
             "📭 У тебе ще немає слів!",
             reply_markup=get_manage_keyboard()
         )
         return
 
-    # Кількість слів на сторінці
-    page_size = 20
-    total_pages = (len(words) + page_size - 1) // page_size
+    text, keyboard = rendered
+    await query.edit_message_text(text, reply_markup=keyboard)
 
-    # Визначаємо діапазон слів для поточної сторінки
-    start_idx = page * page_size
-    end_idx = min(start_idx + page_size, len(words))
 
-    # Формуємо текст зі словами
-    text = f"📚 *Твої слова ({len(words)}):*\n"
-    text += f"Сторінка {page + 1}/{total_pages} (слова {start_idx + 1}-{end_idx})\n\n"
+# Кількість результатів пошуку на сторінці
+FIND_PAGE_SIZE = 10
+FIND_PROMPT = "🔍 Надішли слово або його частину (англійською чи українською):"
+FIND_PROMPT_KEYBOARD = InlineKeyboardMarkup([[BACK_TO_MANAGE_BUTTON]])
 
-    for i in range(start_idx, end_idx):
-        word, translation = words[i]
-        text += f"{i + 1}. {word} - {translation}\n"
 
-    # Створюємо кнопки навігації
-    keyboard = []
-    nav_buttons = []
+async def render_search_page(user_id, text, after_id=0):
+    """Текст і клавіатура сторінки результатів пошуку (слова після after_id)"""
+    # Беремо на одне слово більше, щоб знати, чи є наступна сторінка
+    results = await db.search_words(user_id, text, after_id, FIND_PAGE_SIZE + 1)
+    has_more = len(results) > FIND_PAGE_SIZE
+    results = results[:FIND_PAGE_SIZE]
 
-    # Кнопка «Назад» на попередню сторінку
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"words_page_{page - 1}"))
+    if not results:
+        return f"🔍 За запитом «{text}» нічого не знайдено.", FIND_PROMPT_KEYBOARD
 
-    # Кнопка «Вперед» на наступну сторінку
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton("Вперед ➡️", callback_data=f"words_page_{page + 1}"))
+    lines = [f"🔍 Знайдено за запитом «{text}»:", ""]
+    lines.extend(f"• {word} - {translation}" for _, (word, translation) in results)
+    lines.extend(["", "Натисни на слово, щоб видалити його."])
 
-    # Додаємо навігаційні кнопки, якщо їх більше нуля
+    keyboard = []
+    for word_id, (word, translation) in results:
+        button_text = f"❌ {word} - {translation}"
+        if len(button_text) > 30:
+            button_text = f"❌ {word} - {translation[:20]}..."
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data("delete_word", word_id))])
+
+    nav_buttons = []
+    if after_id:
+        nav_buttons.append(InlineKeyboardButton("⏮️ На початок", callback_data=callback_data("find_page", 0)))
+    if has_more:
+        nav_buttons.append(InlineKeyboardButton("Далі ➡️", callback_data=callback_data("find_page", results[-1][0])))
     if nav_buttons:
         keyboard.append(nav_buttons)
+    keyboard.append([BACK_TO_MANAGE_BUTTON])
+
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+async def search(message, context, user_id, text):
+    """Пошук слів користувача і відповідь першою сторінкою результатів"""
+    text = ' '.join(text.split())
+    context.user_data['waiting_for_search'] = False
+    context.user_data['find_query'] = text
+    page_text, keyboard = await render_search_page(user_id, text)
+    await message.reply_text(page_text, reply_markup=keyboard)
 
-    # Кнопка повернення до меню управління
-    keyboard.append([InlineKeyboardButton("↩️ До меню керування", callback_data="manage_words")])
 
-    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+@timed_handler('find')
+async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /find <слово>: шукає в БД, дані користувача в пам'ять не завантажуються"""
+    user_id = update.effective_user.id
+
+    if not context.args:
+        context.user_data['waiting_for_search'] = True
+        context.user_data['waiting_for_words'] = False
+        await update.message.reply_text(FIND_PROMPT, reply_markup=FIND_PROMPT_KEYBOARD)
+        return
+
+    await search(update.message, context, user_id, ' '.join(context.args))
+
+
+@timed_handler('export')
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /export [csv|tsv]: усі слова користувача файлом
+
+    Слова читаються з БД частинами по EXPORT_CHUNK_SIZE і одразу пишуться
+    в тимчасовий файл, тож у пам'яті ніколи не тримається весь список.
+    Формат файлу такий самий, як при імпорті: CSV з лапками або TSV, який
+    імпорт ділить лише по табуляції, тож слова з " - " чи " | " відновлюються
+    без змін (табуляції всередині слів у TSV замінюються пробілом).
+    """
+    user_id = update.effective_user.id
+    file_format = context.args[0].lower() if context.args else 'csv'
+    if file_format not in ('csv', 'tsv'):
+        await update.message.reply_text("❌ Невідомий формат. Використовуй /export csv або /export tsv")
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.' + file_format)
+    os.close(fd)
+    try:
+        exported = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f) if file_format == 'csv' else None
+            after_id = 0
+            while rows := await db.export_words(user_id, after_id, EXPORT_CHUNK_SIZE):
+                if writer is not None:
+                    writer.writerows((eng, ukr) for _, eng, ukr in rows)
+                else:
+                    # У TSV табуляція - роздільник, тож у самих словах її замінюємо пробілом
+                    f.writelines(
+                        f"{' '.join(eng.split())}\t{' '.join(ukr.split())}\n" for _, eng, ukr in rows
+                    )
+                exported += len(rows)
+                after_id = rows[-1][0]
+
+        if not exported:
+            await update.message.reply_text("📭 У тебе ще немає слів! Додай їх спочатку.")
+            return
+
+        with open(path, 'rb') as f:
+            await update.message.reply_document(
+                f, filename=f"words.{file_format}", caption=f"📤 Експортовано слів: {exported}"
+            )
+    finally:
+        os.remove(path)
+
+
+@timed_handler('backup')
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /backup (лише для ADMIN_IDS): онлайн-копія БД у BACKUP_DIR"""
+    global backup_running
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+    if backup_running:
+        await update.message.reply_text("⏳ Резервна копія вже створюється")
+        return
 
+    backup_running = True
+    try:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        target = os.path.join(BACKUP_DIR, time.strftime('words_bot-%Y%m%d-%H%M%S.db'))
+        status = await update.message.reply_text("⏳ Створюю резервну копію БД...")
+        result = await db.backup(target)
+    finally:
+        backup_running = False
+
+    if result is None:
+        await status.edit_text("❌ Не вдалося створити резервну копію, подробиці в лозі")
+        return
+
+    pages_per_second = result['pages'] / result['seconds'] if result['seconds'] else 0
+    logging.info(
+        f"Резервну копію {result['files']} створено за {result['seconds']:.2f} с: "
+        f"{result['pages']} сторінок, {pages_per_second:.0f} сторінок/с"
+    )
+    await status.edit_text(
+        f"✅ Резервну копію збережено: {', '.join(result['files'])}\n"
+        f"⏱️ {result['seconds']:.1f} с, {result['pages']} сторінок ({pages_per_second:,.0f} сторінок/с)"
+    )
 
+
+@timed_handler('admin_stats')
+async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /admin_stats (лише для ADMIN_IDS): загальна статистика бота з лічильників БД"""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    await user_data.flush()
+    counters = await db.get_counters()
+    daily = await db.get_daily_stats(ALL_USERS, today() - STATS_DAYS + 1)
+
+    await update.message.reply_text(
+        f"📊 Статистика бота\n\n"
+        f"👥 Користувачів: {counters.get('users', 0)}\n"
+        f"📚 Слів: {counters.get('words', 0)}\n"
+        f"🟢 Активних за {ACTIVE_USER_WINDOW} с: {user_data.active_count(ACTIVE_USER_WINDOW)}\n\n"
+        f"{format_activity(*summarize_days(daily))}"
+    )
+
+
+@timed_handler('receive_words')
 async def receive_words(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отримання списку слів"""
+    if context.user_data.get('waiting_for_search'):
+        await search(update.message, context, update.effective_user.id, update.message.text)
+        return
+
     if not context.user_data.get('waiting_for_words'):
         return
 
     user_id = update.effective_user.id
-    init_user_data(user_id)
+    user = await init_user_data(user_id)
 
     text = update.message.text
     new_words = parse_word_list(text)
+    update_duplicates = context.user_data.get('update_duplicates', False)
+    result = await add_user_words(user_id, user, new_words, update_duplicates) if new_words else None
 
-    if new_words:
-        # Додаємо нові слова до існуючих
-        user_data[user_id]['words'].extend(new_words)
-
-        # Зберігаємо оновлені дані в БД
-        db.save_user_data(user_id, user_data[user_id])
-
+    if result is not None:
         await update.message.reply_text(
-            f"✅ Додано {len(new_words)} нових слів!\n"
-            f"📚 Всього слів: {len(user_data[user_id]['words'])}",
+            format_import_result(*result, len(user['deck'])),
             reply_markup=get_main_keyboard()
         )
     else:
@@ -473,29 +1088,259 @@ async def receive_words(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['waiting_for_words'] = False
 
 
-async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Обробка помилок"""
-    print(f"Exception while handling an update: {context.error}")
+def format_import_result(added, updated, skipped, total):
+    """Текст з підсумком додавання слів"""
+    text = f"✅ Додано {added} нових слів!\n"
+    if updated:
+        text += f"♻️ Оновлено переклад: {updated}\n"
+    if skipped:
+        text += f"⏭️ Пропущено дублікатів: {skipped}\n"
+    return text + f"📚 Всього слів: {total}"
+
+
+async def add_user_words(user_id, user, new_words, update_duplicates=False):
+    """Збереження нових слів в БД і в пам'яті з пропуском дублікатів
+
+    Дублікати шукаються за нормалізованим англійським словом в БД, в тій
+    самій транзакції, що і запис (див. DatabaseManager.add_words). Якщо
+    update_duplicates, для вже наявного слова оновлюється переклад, інакше
+    воно пропускається.
+    Повертає (додано, оновлено, пропущено) або None при помилці БД.
+    """
+    result = await db.add_words(user_id, new_words, update_duplicates)
+    if result is None:
+        return None
+
+    deck = user['deck']
+    replaced = []
+    for word_id, vocab_id in result['updated']:
+        replaced.append(deck.vocab_id(word_id))
+        deck.set_vocab_id(word_id, vocab_id)
+
+    # Нові слова одразу потрапляють у чергу повторення
+    for word_id, vocab_id in result['added']:
+        deck.append(word_id, vocab_id)
+        user['queue'].schedule(word_id, 0)
+
+    if result['added'] or result['updated']:
+        user_data.words_changed(
+            user_id, user,
+            added=[vocab_id for _, vocab_id in result['added'] + result['updated']],
+            removed=replaced,
+            pairs=result['vocab']
+        )
+    return len(result['added']), len(result['updated']), result['skipped']
 
 
-def main():
-    """Запуск бота"""
-    app = Application.builder().token(TOKEN).build()
+@timed_handler('receive_document')
+async def receive_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Імпорт слів з файлу .txt, .csv або .tsv"""
+    user_id = update.effective_user.id
+    user = await init_user_data(user_id)
+    document = update.message.document
+
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await update.message.reply_text("❌ Файл завеликий! Максимальний розмір - 20 МБ.")
+        return
+
+    status = await update.message.reply_text("⏳ Завантажую файл...")
+
+    # Файл читаємо з диска рядок за рядком, тож пам'ять не залежить від його розміру
+    fd, path = tempfile.mkstemp(suffix='.import')
+    os.close(fd)
+    try:
+        file = await document.get_file()
+        await file.download_to_drive(path)
+
+        with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+            file_name = (document.file_name or '').lower()
+            if file_name.endswith('.csv'):
+                words = iter_csv_word_list(f)
+            elif file_name.endswith('.tsv'):
+                words = iter_tsv_word_list(f)
+            else:
+                words = iter_word_list(f)
+
+            update_duplicates = context.user_data.get('update_duplicates', False)
+            parsed = 0
+            totals = [0, 0, 0]  # Додано, оновлено, пропущено
+            last_progress = time.monotonic()
+
+            # Кожен пакет слів - окрема транзакція
+            while batch := list(islice(words, IMPORT_BATCH_SIZE)):
+                result = await add_user_words(user_id, user, batch, update_duplicates)
+                if result is None:
+                    break
+                parsed += len(batch)
+                totals = [total + count for total, count in zip(totals, result)]
+
+                if time.monotonic() - last_progress >= IMPORT_PROGRESS_INTERVAL:
+                    await status.edit_text(f"⏳ Оброблено {parsed} слів...")
+                    last_progress = time.monotonic()
+    finally:
+        os.remove(path)
+
+    if parsed:
+        await status.edit_text(
+            format_import_result(*totals, len(user['deck'])),
+            reply_markup=get_main_keyboard()
+        )
+    else:
+        await status.edit_text(
+            "❌ Не вдалося розпізнати слова у файлі. Кожен рядок має бути у форматі:\n\n"
+            "word - переклад"
+        )
+
+    context.user_data['waiting_for_words'] = False
+
+
+async def post_init(application: Application) -> None:
+    """Запуск фонових задач після старту бота"""
+    global metrics_server
+    user_data.start()
+
+    if METRICS_PORT:
+        metrics_server = HttpServer(METRICS_LISTEN, METRICS_PORT)
+
+        @metrics_server.route('GET', '/metrics')
+        async def serve_metrics(request):
+            return HTTPStatus.OK, 'text/plain; version=0.0.4', metrics.render()
+
+        await metrics_server.start()
+
+
+async def post_shutdown(application: Application) -> None:
+    """Запис незбережених змін перед зупинкою бота"""
+    await user_data.stop()
+    if metrics_server is not None:
+        await metrics_server.stop()
+
+
+def shutdown():
+    """Остаточне збереження даних і закриття БД при завершенні процесу"""
+    user_data.close()
+    db.close()
+
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обробка помилок"""
+    logging.error(f"Помилка при обробці оновлення: {context.error}", exc_info=context.error)
+
+
+def build_application():
+    """Створення бота з усіма обробниками"""
+    builder = Application.builder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    if flood_control is not None:
+        builder = builder.rate_limiter(flood_control)
+    if MAX_CONCURRENT_UPDATES > 1:
+        update_processor = UserOrderedUpdateProcessor(MAX_CONCURRENT_UPDATES)
+        # Користувачів з оновленнями в обробці не витісняємо з кешу
+        user_data.pinned = update_processor.in_flight
+        builder = builder.concurrent_updates(update_processor)
+    app = builder.build()
 
     # Обробники
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("find", find_command))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(CommandHandler("backup", backup_command))
+    app.add_handler(CommandHandler("admin_stats", admin_stats_command))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, receive_words))
+    app.add_handler(MessageHandler(
+        filters.Document.FileExtension("txt")
+        | filters.Document.FileExtension("csv")
+        | filters.Document.FileExtension("tsv"),
+        receive_document
+    ))
 
     # Додаємо обробник помилок
     app.add_error_handler(error_handler)
 
-    # Зареєструємо функцію для закриття з'єднання з БД при завершенні роботи
-    atexit.register(db.close)
+    return app
+
+
+def build_webhook_server(app):
+    """HTTP-сервер, що приймає оновлення від Telegram і відповідає на перевірку стану"""
+    server = HttpServer(WEBHOOK_LISTEN, WEBHOOK_PORT)
+
+    @server.route('POST', WEBHOOK_PATH)
+    async def webhook(request):
+        if WEBHOOK_SECRET:
+            token = request.headers.get('x-telegram-bot-api-secret-token', '')
+            if not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+                return HTTPStatus.FORBIDDEN, 'text/plain', b'forbidden'
+
+        if not app.running:
+            # Під час зупинки нові оновлення не приймаємо - Telegram надішле їх повторно
+            return HTTPStatus.SERVICE_UNAVAILABLE, 'text/plain', b'stopping'
+
+        try:
+            update = Update.de_json(json.loads(request.body), app.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logging.error(f"Помилка при розборі оновлення з вебхука: {e}")
+            return HTTPStatus.BAD_REQUEST, 'text/plain', b'bad update'
+
+        await app.update_queue.put(update)
+        return HTTPStatus.OK, 'text/plain', b'ok'
+
+    @server.route('GET', HEALTH_PATH)
+    async def health(request):
+        if app.running:
+            return HTTPStatus.OK, 'text/plain', b'ok'
+        return HTTPStatus.SERVICE_UNAVAILABLE, 'text/plain', b'stopping'
+
+    return server
+
+
+async def run_webhook(app):
+    """Робота через вебхук до SIGINT/SIGTERM з плавною зупинкою
+
+    При зупинці сервер перестає приймати запити, бот обробляє всі оновлення,
+    що вже надійшли, після чого незбережені зміни записуються в БД.
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await app.initialize()
+    await post_init(app)
+    await app.start()
+
+    server = build_webhook_server(app)
+    try:
+        await server.start()
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES
+            )
+        await stop_event.wait()
+    finally:
+        logging.info("Зупинка: обробляємо оновлення, що вже надійшли")
+        await server.stop()
+        await app.stop()
+        await post_shutdown(app)
+        await app.shutdown()
+
+
+def main():
+    """Запуск бота"""
+    app = build_application()
+
+    # Зареєструємо функцію для збереження даних і закриття з'єднання з БД при завершенні роботи
+    atexit.register(shutdown)
 
     print("🤖 Бот запущено!")
-    app.run_polling()
+    if BOT_MODE == 'webhook':
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,160 @@
+import logging
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+
+# Межі кошиків гістограм (секунди): обробники і запити до БД
+HANDLER_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# Поріг (секунди), після якого обробник записується в лог як повільний; 0 - вимкнено
+slow_handler_threshold = 0.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Метрика у текстовому форматі Prometheus; значення зберігаються за кортежем міток"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()  # Значення оновлюються і з потоків БД
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """Значення, яке обчислюється функцією в момент запиту метрик
+
+    kind='counter' - для лічильників, які ведуться в іншому місці (наприклад, у кеші).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, func, kind='gauge'):
+        super().__init__(name, documentation)
+        self.func = func
+        self.kind = kind
+
+    def render(self):
+        return self._header() + [f"{self.name} {_number(self.func())}"]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=HANDLER_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Лічильники по кошиках (не накопичувальні), сума і кількість
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((labels, [list(state[0]), state[1], state[2]]) for labels, state in self._values.items())
+        for labels, (counts, total, number) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                label_text = _labels(self.labelnames, labels, [('le', _number(bound))])
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {number}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """Усі метрики в текстовому форматі Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return ('\n'.join(lines) + '\n').encode()
+
+
+HANDLER_LATENCY = Histogram('bot_handler_seconds', "Час обробки оновлення", ('handler',))
+HANDLER_ERRORS = Counter('bot_handler_errors_total', "Помилки в обробниках", ('handler',))
+DB_QUERY_TIME = Histogram('bot_db_query_seconds', "Час виконання запиту до БД", ('query',), DB_BUCKETS)
+DB_LOCK_WAIT = Histogram('bot_db_lock_wait_seconds', "Очікування замка запису БД", buckets=DB_BUCKETS)
+
+
+def timed_handler(name):
+    """Декоратор обробника: час обробки і помилки за назвою
+
+    name - рядок або функція, що отримує update і повертає назву
+    (наприклад, тип кнопки).
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(update, context):
+            label = name(update) if callable(name) else name
+            started = time.perf_counter()
+            try:
+                return await handler(update, context)
+            except Exception:
+                HANDLER_ERRORS.inc(label)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                HANDLER_LATENCY.observe(elapsed, label)
+                if slow_handler_threshold and elapsed >= slow_handler_threshold:
+                    logging.warning(f"Повільний обробник {label}: {elapsed * 1000:.0f} мс")
+        return wrapper
+    return decorator
+
+
+def timed_query(func, *args):
+    """Виконати запит до БД і записати його час"""
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        DB_QUERY_TIME.observe(time.perf_counter() - started, func.__name__)
@@ -0,0 +1,36 @@
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Обмежений LRU-кеш готових сторінок (текст і клавіатура)
+
+    Ключ містить версію списку слів користувача, тож після додавання чи
+    видалення слів старі сторінки просто перестають запитуватись і з часом
+    витісняються.
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Готова сторінка з кешу або None"""
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            self._pages.move_to_end(key)
+            return page
+
+        self.misses += 1
+        return None
+
+    def put(self, key, page):
+        self._pages[key] = page
+        if len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+    def stats(self):
+        """Лічильники кешу"""
+        return {'entries': len(self._pages), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,131 @@
+"""Офлайн-розбиття однофайлової БД бота на шарди
+
+Копіює користувачів, їхні слова і потрібну їм частину спільного словника з
+однієї БД у файли шардів (words_bot.0.db, words_bot.1.db, ...), розподіляючи
+користувачів так само, як ShardedDatabaseManager. Бот на час розбиття має
+бути зупинений. Вихідний файл лишається як є (лише схема оновлюється до
+поточної версії), тож після перевірки його можна прибрати вручну.
+
+Запуск: python reshard.py --shards 4 [--source words_bot.db]
+Потім запускайте бота з DB_SHARDS=4 і тим самим DB_PATH.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from db_manager import ALL_USERS, RECOUNT_SQL, DatabaseManager, shard_index, shard_paths
+
+# Таблиці, кількість рядків яких має зійтися після розбиття
+CHECKED_TABLES = ('users', 'words')
+
+
+def count_rows(conn, schema='main'):
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {schema}.{table}').fetchone()[0] for table in CHECKED_TABLES}
+
+
+def copy_shard(source, target, index, shards):
+    """Перенесення користувачів шарду index у новий файл target"""
+    shard = DatabaseManager(target, readers=0)
+    conn = shard._conn
+    conn.create_function('shard_index', 1, lambda user_id: shard_index(user_id, shards), deterministic=True)
+    conn.execute('ATTACH DATABASE ? AS src', (source,))
+    try:
+        with conn:
+            conn.execute(
+                'CREATE TEMP TABLE shard_users AS SELECT user_id FROM src.users WHERE shard_index(user_id) = ?',
+                (index,)
+            )
+            # word_count рахують тригери при вставці слів
+            conn.execute('''
+                         INSERT INTO users (user_id, current_index, created_at, updated_at, next_word_id,
+                                            shuffle_seed, shuffle_position)
+                         SELECT user_id, current_index, created_at, updated_at, next_word_id,
+                                shuffle_seed, shuffle_position
+                         FROM src.users WHERE user_id IN temp.shard_users
+                         ''')
+            # Ідентифікатори словника лишаються тими самими, що і в джерелі
+            conn.execute('''
+                         INSERT INTO terms (term_id, key)
+                         SELECT term_id, key FROM src.terms WHERE term_id IN (
+                             SELECT term_id FROM src.words WHERE user_id IN temp.shard_users
+                         )
+                         ''')
+            conn.execute('''
+                         INSERT INTO vocab (vocab_id, term_id, eng, ukr)
+                         SELECT vocab_id, term_id, eng, ukr FROM src.vocab WHERE vocab_id IN (
+                             SELECT vocab_id FROM src.words WHERE user_id IN temp.shard_users
+                         )
+                         ''')
+            conn.execute('''
+                         INSERT INTO words (user_id, word_id, vocab_id, term_id, ease, interval, repetitions, due_at)
+                         SELECT user_id, word_id, vocab_id, term_id, ease, interval, repetitions, due_at
+                         FROM src.words WHERE user_id IN temp.shard_users
+                         ''')
+            # Денна статистика: рядки користувачів шарду, суми по шарду рахуються заново
+            conn.execute('''
+                         INSERT INTO daily_stats (user_id, day, words_added, reviews, reveals)
+                         SELECT user_id, day, words_added, reviews, reveals
+                         FROM src.daily_stats WHERE user_id IN temp.shard_users
+                         ''')
+            conn.execute('''
+                         INSERT INTO daily_stats (user_id, day, words_added, reviews, reveals)
+                         SELECT ?, day, SUM(words_added), SUM(reviews), SUM(reveals)
+                         FROM daily_stats GROUP BY day
+                         ''', (ALL_USERS,))
+            conn.execute(RECOUNT_SQL)
+            conn.execute('DROP TABLE temp.shard_users')
+        return count_rows(conn)
+    finally:
+        conn.execute('DETACH DATABASE src')
+        shard.close()
+
+
+def reshard(source, shards):
+    """Розбиття source на shards файлів; повертає шляхи до них"""
+    targets = shard_paths(source, shards)
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing:
+        raise FileExistsError(f"Файли шардів уже існують: {', '.join(existing)}")
+
+    # Оновлюємо схему джерела, щоб копіювати таблиці поточної версії
+    source_db = DatabaseManager(source, readers=0)
+    expected = count_rows(source_db._conn)
+    source_db.close()
+
+    totals = dict.fromkeys(CHECKED_TABLES, 0)
+    for index, target in enumerate(targets):
+        started = time.perf_counter()
+        counts = copy_shard(source, target, index, shards)
+        for table, rows in counts.items():
+            totals[table] += rows
+        logging.info(f"Шард {index} ({target}): {counts}, {time.perf_counter() - started:.1f} с")
+
+    if totals != expected:
+        raise RuntimeError(f"Кількість рядків не збігається: було {expected}, стало {totals}")
+    logging.info(f"Розбито {expected} на {shards} шардів")
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=os.getenv('DB_PATH', 'words_bot.db'), help="однофайлова БД бота")
+    parser.add_argument('--shards', type=int, required=True, help="кількість шардів (DB_SHARDS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if args.shards < 2:
+        parser.error("--shards має бути не менше 2")
+    if not os.path.exists(args.source):
+        parser.error(f"Файл {args.source} не знайдено")
+
+    try:
+        reshard(args.source, args.shards)
+    except (FileExistsError, RuntimeError) as e:
+        logging.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+import random
+from array import array
+from bisect import bisect_left
+
+# Параметри алгоритму SM-2
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY = 24 * 60 * 60
+# Через скільки секунд повторити слово, яке користувач не згадав
+RELEARN_DELAY = 10 * 60
+# На скільки секунд відкласти слово, пропущене без оцінки
+SKIP_DELAY = 60
+
+# Оцінки відповіді (шкала SM-2 від 0 до 5)
+QUALITY_KNEW = 4
+QUALITY_FORGOT = 1
+
+
+class Card:
+    """Стан повторення одного слова"""
+    __slots__ = ('ease', 'interval', 'repetitions', 'due_at')
+
+    def __init__(self, ease=DEFAULT_EASE, interval=0.0, repetitions=0, due_at=0):
+        self.ease = ease
+        self.interval = interval  # Дні
+        self.repetitions = repetitions
+        self.due_at = due_at  # Unix-час наступного повторення; 0 - нове слово
+
+
+def review(card, quality, now):
+    """Оновлення картки за алгоритмом SM-2 після відповіді з оцінкою quality"""
+    if quality >= 3:
+        card.repetitions += 1
+        if card.repetitions == 1:
+            card.interval = 1.0
+        elif card.repetitions == 2:
+            card.interval = 6.0
+        else:
+            card.interval = round(card.interval * card.ease, 2)
+        card.due_at = int(now + card.interval * DAY)
+    else:
+        # Забуте слово вивчаємо заново і показуємо невдовзі
+        card.repetitions = 0
+        card.interval = 0.0
+        card.due_at = int(now + RELEARN_DELAY)
+
+    card.ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+
+def is_graded(repetitions, ease):
+    """Чи оцінювалась картка: review() або збільшує repetitions, або (для забутого слова) зменшує ease"""
+    return repetitions > 0 or ease != DEFAULT_EASE
+
+
+class Deck:
+    """Слова користувача і стан їх повторення у вигляді паралельних масивів
+
+    Замість списку [eng, ukr] і об'єкта Card на кожне слово зберігаються
+    лише числа: ідентифікатор слова, ідентифікатор пари в спільному словнику
+    (vocab_id) і параметри SM-2 - 36 байт на слово. Самі рядки лежать у
+    спільному словнику один раз для всіх користувачів. word_ids відсортовані
+    за зростанням, тож слово за ідентифікатором шукається за O(log n).
+    """
+    __slots__ = ('word_ids', 'vocab_ids', 'ease', 'interval', 'repetitions', 'due_at')
+
+    def __init__(self):
+        self.word_ids = array('I')
+        self.vocab_ids = array('I')
+        self.ease = array('d')
+        self.interval = array('d')  # Дні
+        self.repetitions = array('I')
+        self.due_at = array('q')  # Unix-час наступного повторення; 0 - нове слово
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def __contains__(self, word_id):
+        return self.index(word_id) is not None
+
+    @property
+    def nbytes(self):
+        return sum(len(values) * values.itemsize for values in (
+            self.word_ids, self.vocab_ids, self.ease, self.interval, self.repetitions, self.due_at
+        ))
+
+    def index(self, word_id):
+        """Позиція слова за ідентифікатором або None"""
+        if word_id is None:
+            return None
+        index = bisect_left(self.word_ids, word_id)
+        if index < len(self.word_ids) and self.word_ids[index] == word_id:
+            return index
+        return None
+
+    def append(self, word_id, vocab_id, card=None):
+        """Додати слово в кінець (ідентифікатори нових слів більші за наявні)"""
+        card = card or Card()
+        self.word_ids.append(word_id)
+        self.vocab_ids.append(vocab_id)
+        self.ease.append(card.ease)
+        self.interval.append(card.interval)
+        self.repetitions.append(card.repetitions)
+        self.due_at.append(card.due_at)
+
+    def remove(self, word_id):
+        """Видалити слово; повертає його vocab_id або None, якщо слова немає"""
+        index = self.index(word_id)
+        if index is None:
+            return None
+        vocab_id = self.vocab_ids.pop(index)
+        for values in (self.word_ids, self.ease, self.interval, self.repetitions, self.due_at):
+            del values[index]
+        return vocab_id
+
+    def clear(self):
+        self.__init__()
+
+    def vocab_id(self, word_id):
+        return self.vocab_ids[self.index(word_id)]
+
+    def set_vocab_id(self, word_id, vocab_id):
+        self.vocab_ids[self.index(word_id)] = vocab_id
+
+    def get_due(self, word_id):
+        """Час повторення слова або None, якщо слова немає"""
+        index = self.index(word_id)
+        return None if index is None else self.due_at[index]
+
+    def set_due(self, word_id, due_at):
+        self.due_at[self.index(word_id)] = due_at
+
+    def graded(self, word_id):
+        """Чи оцінювалось слово хоч раз (див. is_graded)"""
+        i = self.index(word_id)
+        return i is not None and is_graded(self.repetitions[i], self.ease[i])
+
+    def card(self, word_id):
+        """Копія стану повторення слова; зміни зберігаються через store()"""
+        i = self.index(word_id)
+        if i is None:
+            return None
+        return Card(self.ease[i], self.interval[i], self.repetitions[i], self.due_at[i])
+
+    def store(self, word_id, card):
+        i = self.index(word_id)
+        self.ease[i] = card.ease
+        self.interval[i] = card.interval
+        self.repetitions[i] = card.repetitions
+        self.due_at[i] = card.due_at
+
+
+# Запис у купі - одне число: (due_at << WORD_ID_BITS) | word_id
+WORD_ID_BITS = 32
+WORD_ID_MASK = (1 << WORD_ID_BITS) - 1
+# Час повторення в записі купи обмежений 2106 роком, щоб запис влазив у 64 біти
+MAX_HEAP_DUE = (1 << 32) - 1
+
+
+def _heap_item(due_at, word_id):
+    return (min(due_at, MAX_HEAP_DUE) << WORD_ID_BITS) | word_id
+
+
+def _sift_down(heap, pos):
+    """Підняти новий елемент з позиції pos до його місця (як heapq._siftdown)"""
+    item = heap[pos]
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        if item >= heap[parent]:
+            break
+        heap[pos] = heap[parent]
+        pos = parent
+    heap[pos] = item
+
+
+def _sift_up(heap, pos):
+    """Опустити елемент з позиції pos до його місця"""
+    end = len(heap)
+    item = heap[pos]
+    child = 2 * pos + 1
+    while child < end:
+        if child + 1 < end and heap[child + 1] < heap[child]:
+            child += 1
+        if item <= heap[child]:
+            break
+        heap[pos] = heap[child]
+        pos = child
+        child = 2 * pos + 1
+    heap[pos] = item
+
+
+class ReviewQueue:
+    """Черга слів за часом повторення (купа з лінивим видаленням)
+
+    Запис у купі дійсний, лише якщо слово ще є в колоді і його due_at
+    збігається з записаним - тож видалення і перепланування коштують
+    O(log n) без пошуку по купі. Купа зберігається в array('Q') по 8 байт
+    на запис, тому heapq (який працює лише зі списками) не використовується.
+
+    graded_only - у черзі лише слова, які вже оцінювались (для випадкового
+    порядку: нові й пропущені без оцінки слова бере Shuffle, а не черга).
+    """
+
+    def __init__(self, deck, graded_only=False):
+        self.deck = deck  # Колода, спільна зі станом користувача
+        self.graded_only = graded_only
+        self._rebuild()
+
+    def _rebuild(self):
+        deck = self.deck
+        items = map(_heap_item, deck.due_at, deck.word_ids)
+        if self.graded_only:
+            items = (
+                item for item, repetitions, ease in zip(items, deck.repetitions, deck.ease)
+                if is_graded(repetitions, ease)
+            )
+        # Відсортований масив - уже правильна купа
+        self._heap = array('Q', sorted(items))
+
+    def _is_current(self, item):
+        word_id = item & WORD_ID_MASK
+        due_at = self.deck.get_due(word_id)
+        return due_at is not None and _heap_item(due_at, word_id) == item
+
+    def _pop(self):
+        heap = self._heap
+        last = heap.pop()
+        if heap:
+            heap[0] = last
+            _sift_up(heap, 0)
+
+    def schedule(self, word_id, due_at):
+        """Встановити час повторення слова"""
+        self.deck.set_due(word_id, due_at)
+        if self.graded_only and not self.deck.graded(word_id):
+            return
+        self._heap.append(_heap_item(due_at, word_id))
+        _sift_down(self._heap, len(self._heap) - 1)
+
+        # Не даємо застарілим записам роздувати купу
+        if len(self._heap) > 2 * len(self.deck) + 64:
+            self._rebuild()
+
+    def peek_due(self, now):
+        """Ідентифікатор слова, яке найраніше треба повторити, або None, якщо таких немає"""
+        heap = self._heap
+        while heap and not self._is_current(heap[0]):
+            self._pop()
+
+        if heap and heap[0] >> WORD_ID_BITS <= now:
+            return heap[0] & WORD_ID_MASK
+        return None
+
+
+# Випадковий порядок: seed кола = (ключ << 38) | (перший word_id << 6) | розрядність області
+SHUFFLE_BITS_FIELD = 6
+SHUFFLE_START_FIELD = 32
+SHUFFLE_KEY_BITS = 25
+SHUFFLE_ROUNDS = 4
+# Непарний множник (з LCG PCG) для перемішування бітів у раундах
+SHUFFLE_MULTIPLIER = 6364136223846793005
+MASK64 = (1 << 64) - 1
+
+
+def _feistel_round(half, key, round_, mask):
+    """Раундова функція: ключ і номер раунду перемішуються з половиною значення"""
+    x = ((half + 1) * SHUFFLE_MULTIPLIER + key * (2 * round_ + 1)) & MASK64
+    x ^= x >> 29
+    x = (x * SHUFFLE_MULTIPLIER) & MASK64
+    x ^= x >> 32
+    return x & mask
+
+
+def _permute(value, key, bits):
+    """Бієкція на [0, 2^bits) з ключем
+
+    Мережа Фейстеля на парній кількості бітів (бієкція для будь-якої
+    раундової функції, тож різні ключі дають різні перестановки), а значення
+    поза областю проганяються через неї ще раз (cycle walking) - область
+    щонайбільше вдвічі менша, тож це в середньому не більше двох проходів.
+    """
+    half_bits = (bits + 1) // 2
+    half_mask = (1 << half_bits) - 1
+    limit = 1 << bits
+    while True:
+        left, right = value >> half_bits, value & half_mask
+        for round_ in range(SHUFFLE_ROUNDS):
+            left, right = right, left ^ _feistel_round(right, key, round_, half_mask)
+        value = (left << half_bits) | right
+        if value < limit:
+            return value
+
+
+class Shuffle:
+    """Випадковий порядок слів без повторів, поки не показано всі
+
+    Перестановка не зберігається, а обчислюється для кожної позиції:
+    коло переставляє область word_id [start, start + 2^bits), що покриває
+    всі слова на його початку, і пропускає ідентифікатори, яких у колоді
+    немає. Тож стан - лише (seed, position): видалення слова не потребує
+    жодних змін (його ідентифікатор просто пропускається), а нові слова, що
+    потрапили в область кола, покажуться ще в цьому колі, решта - в
+    наступному. seed = 0 - порожнє коло, наступне слово почне нове.
+    """
+    __slots__ = ('seed', 'position')
+
+    def __init__(self, seed=0, position=0):
+        self.seed = seed
+        self.position = position
+
+    def _new_round(self, deck):
+        start = deck.word_ids[0]
+        bits = (deck.word_ids[-1] - start).bit_length()
+        key = random.getrandbits(SHUFFLE_KEY_BITS)
+        self.seed = (key << (SHUFFLE_START_FIELD + SHUFFLE_BITS_FIELD)) | (start << SHUFFLE_BITS_FIELD) | bits
+        self.position = 0
+
+    def next(self, deck, last=None):
+        """Наступне слово кола (word_id) або None для порожньої колоди
+
+        last - щойно показане слово, щоб не показати його двічі поспіль:
+        усередині кола воно пропускається (його щойно бачили), а нове коло
+        з нього не починається - для такого кола береться інший ключ.
+        """
+        if not deck:
+            return None
+        fresh = self.position == 0  # У колі ще не показано жодного слова
+        while True:
+            bits = self.seed & ((1 << SHUFFLE_BITS_FIELD) - 1)
+            start = (self.seed >> SHUFFLE_BITS_FIELD) & ((1 << SHUFFLE_START_FIELD) - 1)
+            key = self.seed >> (SHUFFLE_START_FIELD + SHUFFLE_BITS_FIELD)
+            while self.position < 1 << bits:
+                word_id = start + _permute(self.position, key, bits)
+                self.position += 1
+                if word_id not in deck:
+                    continue
+                if word_id != last or len(deck) == 1:
+                    return word_id
+                if fresh:
+                    break
+            # Коло завершено (або не почалось): нове охоплює всі поточні слова, тож слово знайдеться
+            self._new_round(deck)
+            fresh = True
@@ -0,0 +1,66 @@
+import asyncio
+import sys
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Паралельна обробка оновлень різних користувачів зі збереженням порядку для кожного
+
+    Оновлення одного користувача обробляються строго по черзі (асинхронний
+    замок на користувача, черга якого FIFO), а одночасно обробляється не
+    більше max_concurrent_updates оновлень. Оновлення чекає на свою чергу у
+    користувача до того, як займе загальне місце, тож користувач, що надіслав
+    багато оновлень, не блокує решту. in_flight() показує, чи є в
+    користувача оновлення в обробці або в черзі (їх не можна витісняти з кешу).
+    """
+
+    __slots__ = ('_active', '_user_locks')
+
+    def __init__(self, max_concurrent_updates):
+        # Загальне обмеження застосовуємо самі (після замка користувача), тому
+        # семафор базового класу лише пропускає оновлення далі
+        super().__init__(sys.maxsize)
+        self._active = asyncio.Semaphore(max_concurrent_updates)
+        self._user_locks = {}  # user_id -> [замок, кількість оновлень, що його чекають або тримають]
+
+    @staticmethod
+    def _user_key(update):
+        """Користувач (або чат), для якого зберігається порядок; None - порядок неважливий"""
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, 'effective_chat', None)
+        if chat is not None:
+            return chat.id
+        return None
+
+    def in_flight(self, key):
+        """Чи є в користувача (або чату) оновлення, що обробляються чи чекають на чергу"""
+        return key in self._user_locks
+
+    async def do_process_update(self, update, coroutine):
+        key = self._user_key(update)
+        if key is None:
+            async with self._active:
+                await coroutine
+            return
+
+        slot = self._user_locks.get(key)
+        if slot is None:
+            slot = self._user_locks[key] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                async with self._active:
+                    await coroutine
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._user_locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
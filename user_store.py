@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from itertools import count
+
+from scheduler import Deck, ReviewQueue
+
+# Версії списків слів; унікальні для всього процесу, тож не повторюються
+# і після повторного завантаження користувача
+_versions = count(1)
+
+# Приблизні накладні витрати пам'яті на користувача та на запис у черзі повторення (байти)
+ENTRY_OVERHEAD = 1024
+QUEUE_ITEM_OVERHEAD = 8
+# Накладні витрати на пару спільного словника: кортеж, ключ і місця в словниках (без самих рядків)
+VOCAB_ENTRY_OVERHEAD = 160
+
+
+def estimate_size(entry):
+    """Приблизний розмір даних користувача в пам'яті (без спільного словника)"""
+    deck = entry['deck']
+    return ENTRY_OVERHEAD + deck.nbytes + QUEUE_ITEM_OVERHEAD * len(deck)
+
+
+def vocab_entry_size(pair):
+    """Приблизний розмір пари (eng, ukr) спільного словника в пам'яті"""
+    return VOCAB_ENTRY_OVERHEAD + sys.getsizeof(pair[0]) + sys.getsizeof(pair[1])
+
+
+def _dirty_row(user_id, entry):
+    """Рядок для save_cursors; лічильник показаних перекладів обнуляється"""
+    reveals, entry['reveals'] = entry['reveals'], 0
+    shuffle = entry['shuffle']
+    if shuffle is None:
+        return user_id, entry['current_index'], None, 0, reveals
+    return user_id, entry['current_index'], shuffle.seed, shuffle.position, reveals
+
+
+class UserStore:
+    """Обмежений LRU-кеш даних користувачів з відкладеним записом в БД
+
+    Зміни позиції (current_index і стан випадкового порядку shuffle) і
+    кількість показаних перекладів (reveals) не пишуться в БД одразу:
+    користувач позначається як змінений, а всі змінені позиції записуються
+    однією транзакцією раз на flush_interval секунд або коли змінених стає
+    flush_threshold. flush_interval - це максимальне вікно втрати даних
+    при аварійному завершенні; 0 вмикає запис одразу.
+
+    Кеш тримає не більше max_entries користувачів і приблизно max_bytes
+    пам'яті (0 - без обмеження), а користувачів, неактивних довше за
+    idle_ttl секунд, витісняє. Перед витісненням незбережені зміни
+    записуються, а при наступному зверненні дані знову читаються з БД.
+    Користувачі, для яких pinned(user_id) істинне (їхні оновлення зараз
+    обробляються), не витісняються: обробник тримає їхні дані між
+    очікуваннями. Тоді кеш може тимчасово перевищити ліміти.
+
+    Текст слів зберігається в спільному словнику vocabulary (vocab_id ->
+    (eng, ukr)) по одному разу для всіх користувачів; дані користувача
+    містять лише числові масиви (Deck). Словник тримає лише пари
+    користувачів у кеші: кожне їхнє слово - посилання на пару, і пара
+    видаляється разом з останнім посиланням (при витісненні чи видаленні
+    слова). Розмір словника входить у max_bytes.
+    """
+
+    def __init__(self, db, flush_interval=5.0, flush_threshold=100,
+                 max_entries=10000, max_bytes=0, idle_ttl=3600.0, pinned=None):
+        self.db = db
+        self.pinned = pinned  # Функція user_id -> bool або None
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+
+        self._data = OrderedDict()  # user_id -> дані, від найдавніше використаних
+        self._sizes = {}
+        self._last_access = {}
+        self._bytes = 0
+        self._dirty = {}  # user_id -> дані користувача, що чекають на запис
+        self._loading = {}
+        self._flush_task = None
+        self.vocabulary = {}  # vocab_id -> (eng, ukr), спільний для всіх користувачів
+        self._vocab_refs = {}  # vocab_id -> кількість слів користувачів у кеші з цією парою
+        self._vocab_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, user_id):
+        return user_id in self._data
+
+    def __getitem__(self, user_id):
+        return self._data[user_id]
+
+    def __len__(self):
+        return len(self._data)
+
+    async def get(self, user_id):
+        """Дані користувача з кешу або з БД (створюються, якщо їх немає)"""
+        entry = self._data.get(user_id)
+        if entry is not None:
+            self.hits += 1
+            self._data.move_to_end(user_id)
+            self._last_access[user_id] = time.monotonic()
+            return entry
+
+        self.misses += 1
+
+        # Одночасні звернення до того ж користувача чекають на одне завантаження
+        if user_id in self._loading:
+            return await asyncio.shield(self._loading[user_id])
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        try:
+            entry = await self._load(user_id)
+            self._insert(user_id, entry)
+            future.set_result(entry)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._loading[user_id]
+
+        await self._evict_over_limit(keep=user_id)
+        return entry
+
+    async def _load(self, user_id):
+        """Завантаження даних користувача з БД"""
+        saved_data = await self.db.get_user_data(user_id)
+
+        if saved_data:
+            # Посилання беремо до першого очікування, щоб потрібні пари не видалило
+            # витіснення інших користувачів, поки текст довантажується
+            vocab_ids = saved_data['deck'].vocab_ids
+            self._retain(vocab_ids)
+            try:
+                # Текст довантажуємо лише для пар, яких ще немає в спільному словнику
+                missing = set(vocab_ids).difference(self.vocabulary)
+                if missing:
+                    pairs = await self.db.get_vocab(missing)
+                    if pairs is None:
+                        raise RuntimeError(f"Не вдалося завантажити слова користувача {user_id}")
+                    self._add_pairs(pairs)
+            except BaseException:
+                self._release(vocab_ids)
+                raise
+
+            # Якщо є дані в БД, використовуємо їх
+            saved_data['show_translation'] = False
+            saved_data['reveals'] = 0
+            saved_data['current_word_id'] = None
+            saved_data['queue'] = ReviewQueue(saved_data['deck'], graded_only=saved_data['shuffle'] is not None)
+            saved_data['version'] = next(_versions)
+            return saved_data
+
+        # Якщо даних немає, створюємо нові
+        await self.db.create_user(user_id)
+        deck = Deck()
+        return {
+            'deck': deck,  # Слова (vocab_id у спільному словнику) і стан їх повторення
+            'queue': ReviewQueue(deck),  # Черга слів за часом повторення
+            'version': next(_versions),  # Змінюється при кожній зміні списку слів
+            'current_index': 0,
+            'shuffle': None,  # Shuffle - випадковий порядок, None - по черзі
+            'current_word_id': None,  # Слово, показане останнім
+            'show_translation': False,  # Додаємо флаг для показу перекладу
+            'reveals': 0  # Показаних перекладів, ще не записаних у денну статистику
+        }
+
+    def _insert(self, user_id, entry):
+        self._data[user_id] = entry
+        self._last_access[user_id] = time.monotonic()
+        self._sizes[user_id] = estimate_size(entry)
+        self._bytes += self._sizes[user_id]
+
+    def _remove(self, user_id):
+        entry = self._data.pop(user_id)
+        self._bytes -= self._sizes.pop(user_id)
+        del self._last_access[user_id]
+        self._release(entry['deck'].vocab_ids)
+        self.evictions += 1
+        return entry
+
+    def _retain(self, vocab_ids):
+        refs = self._vocab_refs
+        for vocab_id in vocab_ids:
+            refs[vocab_id] = refs.get(vocab_id, 0) + 1
+
+    def _release(self, vocab_ids):
+        """Зняти посилання; пари без посилань видаляються зі словника"""
+        refs = self._vocab_refs
+        for vocab_id in vocab_ids:
+            count = refs[vocab_id] - 1
+            if count:
+                refs[vocab_id] = count
+                continue
+            del refs[vocab_id]
+            pair = self.vocabulary.pop(vocab_id, None)
+            if pair is not None:
+                self._vocab_bytes -= vocab_entry_size(pair)
+
+    def _add_pairs(self, pairs):
+        """Додати до словника тексти пар, на які вже взято посилання"""
+        for vocab_id, pair in pairs.items():
+            if vocab_id not in self.vocabulary and vocab_id in self._vocab_refs:
+                self.vocabulary[vocab_id] = pair
+                self._vocab_bytes += vocab_entry_size(pair)
+
+    def words_changed(self, user_id, entry, added=(), removed=(), pairs=None):
+        """Нова версія списку слів і перерахунок розміру після його зміни
+
+        added і removed - vocab_id слів, що з'явились у колоді чи зникли з
+        неї (по разу на слово), pairs - тексти нових пар {vocab_id: (eng, ukr)}.
+        """
+        entry['version'] = next(_versions)
+
+        # Посилання витісненого користувача вже зняті при витісненні
+        if self._data.get(user_id) is entry:
+            self._retain(added)
+            self._add_pairs(pairs or {})
+            self._release(removed)
+            size = estimate_size(self._data[user_id])
+            self._bytes += size - self._sizes[user_id]
+            self._sizes[user_id] = size
+
+    def _is_pinned(self, user_id):
+        return self.pinned is not None and self.pinned(user_id)
+
+    def _over_limit(self):
+        if self.max_entries and len(self._data) > self.max_entries:
+            return True
+        return bool(self.max_bytes) and self._bytes + self._vocab_bytes > self.max_bytes
+
+    async def _evict_over_limit(self, keep=None):
+        """Витіснення найдавніше використаних користувачів понад ліміти"""
+        evicted = []
+        for user_id in list(self._data):
+            if not self._over_limit():
+                break
+            if user_id == keep or self._is_pinned(user_id):
+                continue
+            self._remove(user_id)
+            evicted.append(user_id)
+
+        await self._write_back(evicted)
+
+    async def _evict_idle(self):
+        """Витіснення користувачів, неактивних довше за idle_ttl"""
+        if not self.idle_ttl:
+            return
+
+        deadline = time.monotonic() - self.idle_ttl
+        evicted = []
+        for user_id in list(self._data):
+            if self._last_access[user_id] > deadline:
+                break
+            if self._is_pinned(user_id):
+                continue
+            self._remove(user_id)
+            evicted.append(user_id)
+
+        await self._write_back(evicted)
+
+    async def _write_back(self, user_ids):
+        """Запис незбережених змін витіснених користувачів"""
+        batch = [
+            _dirty_row(user_id, self._dirty.pop(user_id))
+            for user_id in user_ids if user_id in self._dirty
+        ]
+        if batch:
+            await self.db.save_cursors(batch)
+
+    async def mark_dirty(self, user_id, entry):
+        """Позначити позицію користувача як незбережену"""
+        self._dirty[user_id] = entry
+
+        if self.flush_interval <= 0 or len(self._dirty) >= self.flush_threshold:
+            await self.flush()
+
+    def _take_dirty(self):
+        """Забрати накопичені зміни у вигляді рядків save_cursors"""
+        batch = [_dirty_row(user_id, entry) for user_id, entry in self._dirty.items()]
+        self._dirty.clear()
+        return batch
+
+    async def flush(self):
+        """Записати всі змінені позиції однією транзакцією"""
+        batch = self._take_dirty()
+        if batch:
+            await self.db.save_cursors(batch)
+
+    async def _flush_loop(self):
+        """Періодичний запис змінених позицій і витіснення неактивних"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self._evict_idle()
+            except Exception as e:
+                logging.error(f"Помилка при періодичному збереженні даних: {e}")
+
+    def active_count(self, window):
+        """Кількість користувачів, що зверталися до бота за останні window секунд"""
+        deadline = time.monotonic() - window
+        active = 0
+        for user_id in reversed(self._data):
+            if self._last_access[user_id] <= deadline:
+                break
+            active += 1
+        return active
+
+    def stats(self):
+        """Лічильники кешу"""
+        return {
+            'entries': len(self._data),
+            'bytes': self._bytes + self._vocab_bytes,
+            'vocabulary_bytes': self._vocab_bytes,
+            'dirty': len(self._dirty),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'vocabulary': len(self.vocabulary),
+        }
+
+    def start(self):
+        """Запустити періодичний запис (в межах циклу подій бота)"""
+        if self.flush_interval > 0 and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Зупинити періодичний запис і записати залишок"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        logging.info(f"Статистика кешу користувачів: {self.stats()}")
+
+    def close(self):
+        """Остаточний синхронний запис при завершенні процесу"""
+        batch = self._take_dirty()
+        if batch:
+            self.db.db.save_cursors(batch)